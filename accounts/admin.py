@@ -1,16 +1,24 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from chatapp.paginators import EstimatedCountPaginator
 from .models import CustomUser
 
 
 @admin.register(CustomUser)
 class CustomUserAdmin(UserAdmin):
-    """Admin configuration for the Custom User model."""
+    """
+    Admin configuration for the Custom User model.
+    Search uses prefix lookups served by the unique username/email indexes,
+    and counts are estimated on PostgreSQL for large user tables.
+    """
     model = CustomUser
     list_display = ('username', 'email', 'is_online', 'last_seen', 'is_staff')
     list_filter = ('is_online', 'is_staff', 'is_active')
-    search_fields = ('username', 'email')
+    search_fields = ('username__startswith', 'email__startswith')
+    search_help_text = 'Username or email prefix (case-sensitive).'
     ordering = ('username',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     fieldsets = UserAdmin.fieldsets + (
         ('Chat Status', {'fields': ('is_online', 'last_seen')}),
@@ -1,15 +1,93 @@
 from django.contrib import admin
-from .models import Message
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.db.models import BooleanField, Q
+from django.db.models.expressions import RawSQL
+from chatapp.paginators import EstimatedCountPaginator
+from .fragments import invalidate_messages
+from .models import Message, Membership, Room
 
 
 @admin.register(Message)
 class MessageAdmin(admin.ModelAdmin):
-    """Admin configuration for the Message model."""
-    list_display = ('sender', 'receiver', 'content_preview', 'timestamp', 'is_read')
-    list_filter = ('is_read', 'timestamp')
-    search_fields = ('sender__username', 'receiver__username', 'content')
+    """
+    Admin configuration for the Message model.
+    Built for very large tables: related users are joined rather than
+    fetched per row, counts are estimated on PostgreSQL, and search only
+    uses indexed lookups (exact usernames plus full-text on content, which
+    for compressed messages holds just the preview).
+    """
+    list_display = ('sender', 'receiver', 'room', 'content_preview', 'timestamp', 'is_read')
+    list_filter = ('is_read',)
+    list_select_related = ('sender', 'receiver', 'room')
+    raw_id_fields = ('sender', 'receiver', 'room')
+    search_fields = ('sender__username__exact', 'receiver__username__exact')
+    search_help_text = (
+        'Exact sender/receiver username, or words in the message. '
+        'Long messages are stored compressed; only their first 200 characters are searched.'
+    )
+    date_hierarchy = 'timestamp'
     ordering = ('-timestamp',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        """Match exact usernames, or message words via the content GIN index."""
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+
+        # Resolve usernames first so every predicate is on chat_message and
+        # PostgreSQL can BitmapOr the sender, receiver and content indexes
+        user_ids = list(get_user_model().objects.filter(username=search_term).values_list('id', flat=True))
+        query = Q()
+        if user_ids:
+            query |= Q(sender_id__in=user_ids) | Q(receiver_id__in=user_ids)
+        if connections[queryset.db].vendor == 'postgresql':
+            query |= Q(RawSQL(
+                f"to_tsvector('simple', {Message._meta.db_table}.content) "
+                f"@@ plainto_tsquery('simple', %s)",
+                [search_term],
+                output_field=BooleanField(),
+            ))
+        else:
+            # Local SQLite databases are small enough to scan
+            query |= Q(content__icontains=search_term)
+        return queryset.filter(query), False
+
+    def get_queryset(self, request):
+        # The changelist only shows previews; don't load compressed bodies
+        return super().get_queryset(request).defer('content_compressed')
+
+    def get_readonly_fields(self, request, obj=None):
+        # `content` holds only a preview once a body is compressed
+        if obj is not None and obj.is_compressed:
+            return ('content',)
+        return super().get_readonly_fields(request, obj)
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change:
+            invalidate_messages([obj.id], obj.sender_id, obj.receiver_id)
 
     def content_preview(self, obj):
         return obj.content[:60] + '...' if len(obj.content) > 60 else obj.content
     content_preview.short_description = 'Message'
+
+
+class MembershipInline(admin.TabularInline):
+    """Inline editor for room members."""
+    model = Membership
+    extra = 0
+    raw_id_fields = ('user',)
+
+
+@admin.register(Room)
+class RoomAdmin(admin.ModelAdmin):
+    """Admin configuration for the Room model."""
+    list_display = ('name', 'created_by', 'created_at')
+    list_select_related = ('created_by',)
+    raw_id_fields = ('created_by',)
+    search_fields = ('name',)
+    ordering = ('name',)
+    inlines = [MembershipInline]
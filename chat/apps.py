@@ -5,3 +5,7 @@ class ChatConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'chat'
     verbose_name = 'Chat'
+
+    def ready(self):
+        # Connects the post_delete handler that removes stored attachment files
+        from . import attachments  # noqa: F401
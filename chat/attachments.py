@@ -0,0 +1,341 @@
+"""
+Chunked, resumable attachment uploads and ranged file serving.
+
+Chunks are streamed from the request straight onto a partial file on local
+disk, so no upload is ever held in memory. Completed files are copied into
+the configured default storage, and thumbnails are generated in a process
+pool so neither the event loop nor the sync view thread waits on image work.
+Uploads left incomplete, or complete but never sent, for UPLOAD_EXPIRY
+seconds are removed by `manage.py cleanup_uploads`. Deleting an attachment
+(directly or with its message) removes its stored file and thumbnail.
+"""
+import logging
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Attachment
+from .thumbnails import make_thumbnail, sniff_image
+
+
+DEFAULTS = {
+    'MAX_SIZE': 25 * 1024 * 1024,
+    'CHUNK_SIZE': 1024 * 1024,
+    'THUMBNAIL_SIZE': (320, 320),
+    'WORKERS': 2,
+    'UPLOAD_TEMP_DIR': None,
+    'CACHE_MAX_AGE': 365 * 24 * 60 * 60,
+    'UPLOAD_EXPIRY': 24 * 60 * 60,
+}
+
+READ_BLOCK = 64 * 1024
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+_pool = None
+_store_pool = None
+
+logger = logging.getLogger(__name__)
+
+
+class UploadError(Exception):
+    """Raised when an upload chunk can't be accepted."""
+
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+def get_config():
+    """Return attachment settings merged over the defaults."""
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'CHAT_ATTACHMENTS', {}))
+    if config['UPLOAD_TEMP_DIR'] is None:
+        config['UPLOAD_TEMP_DIR'] = Path(settings.MEDIA_ROOT) / 'partial'
+    return config
+
+
+def get_pool():
+    """Lazily start the thumbnail process pool."""
+    global _pool
+    if _pool is None:
+        # spawn: forking a running Daphne worker would copy its event loop and threads
+        _pool = ProcessPoolExecutor(
+            max_workers=get_config()['WORKERS'],
+            mp_context=multiprocessing.get_context('spawn'),
+        )
+    return _pool
+
+
+def get_store_pool():
+    """Thread that saves finished thumbnails, off the process pool's callback thread."""
+    global _store_pool
+    if _store_pool is None:
+        _store_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='thumbnail-store')
+    return _store_pool
+
+
+def partial_path(attachment):
+    return Path(get_config()['UPLOAD_TEMP_DIR']) / f'{attachment.id}.part'
+
+
+def received_bytes(attachment):
+    """Bytes received so far; the partial file on disk is the source of truth."""
+    if attachment.is_complete:
+        return attachment.size
+    try:
+        return partial_path(attachment).stat().st_size
+    except FileNotFoundError:
+        return 0
+
+
+def create_upload(user, filename, size, content_type):
+    """Register a new upload and return the Attachment."""
+    config = get_config()
+    if size <= 0 or size > config['MAX_SIZE']:
+        raise UploadError(f'File size must be between 1 and {config["MAX_SIZE"]} bytes.')
+
+    attachment = Attachment.objects.create(
+        uploader=user,
+        original_name=os.path.basename(filename)[:255] or 'file',
+        content_type=(content_type or 'application/octet-stream')[:100],
+        size=size,
+    )
+    path = partial_path(attachment)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.touch()
+    return attachment
+
+
+def append_chunk(attachment, offset, stream, length):
+    """
+    Append `length` bytes from `stream` at `offset`.
+    Returns the new offset; finalizes the attachment once all bytes arrived.
+    """
+    with transaction.atomic():
+        # Concurrent PATCHes to one upload take turns on the row lock, then
+        # re-check the offset (SQLite has no row locks; it is only for development)
+        locked = Attachment.objects.select_for_update().get(pk=attachment.pk)
+        current = received_bytes(locked)
+        if locked.is_complete or offset != current:
+            raise UploadError('Offset mismatch.', status=409, offset=current)
+        if length <= 0 or length > get_config()['CHUNK_SIZE'] or current + length > locked.size:
+            raise UploadError('Invalid chunk length.', offset=current)
+
+        path = partial_path(locked)
+        remaining = length
+        with open(path, 'ab') as out:
+            while remaining:
+                block = stream.read(min(READ_BLOCK, remaining))
+                if not block:
+                    break
+                out.write(block)
+                remaining -= len(block)
+
+        if remaining:
+            # Client went away mid-chunk; drop the partial chunk so it can resume cleanly
+            os.truncate(path, current)
+            raise UploadError('Incomplete chunk.', offset=current)
+
+        offset = current + length
+        if offset == locked.size:
+            finalize(locked)
+            attachment.is_complete = True
+    return offset
+
+
+def finalize(attachment):
+    """
+    Move a completed upload into storage and queue thumbnailing.
+    Only files Pillow verifies as PNG/JPEG/GIF/WebP count as images; their
+    content type is replaced by the sniffed one.
+    """
+    path = partial_path(attachment)
+    content_type = sniff_image(path)
+    if content_type is not None:
+        attachment.is_image = True
+        attachment.content_type = content_type
+    with open(path, 'rb') as fh:
+        attachment.file.save(attachment.original_name, File(fh), save=False)
+    attachment.is_complete = True
+    attachment.save(update_fields=['file', 'is_complete', 'is_image', 'content_type'])
+
+    if attachment.is_image:
+        transaction.on_commit(lambda: queue_thumbnail(attachment.id, path))
+    else:
+        path.unlink(missing_ok=True)
+
+
+def queue_thumbnail(attachment_id, path):
+    future = get_pool().submit(make_thumbnail, str(path), get_config()['THUMBNAIL_SIZE'])
+    future.add_done_callback(
+        lambda f: get_store_pool().submit(_thumbnail_done, attachment_id, path, f)
+    )
+
+
+def _thumbnail_done(attachment_id, path, future):
+    """Store a finished thumbnail; runs on the store thread."""
+    try:
+        result = future.result()
+        if result is None:
+            logger.warning('No thumbnail for attachment %s: Pillow could not render it', attachment_id)
+            return
+        attachment = Attachment.objects.get(id=attachment_id)
+        attachment.thumbnail.save('thumb.webp', ContentFile(result['thumbnail']), save=False)
+        attachment.width = result['width']
+        attachment.height = result['height']
+        attachment.save(update_fields=['thumbnail', 'width', 'height'])
+    except Attachment.DoesNotExist:
+        pass  # Deleted while the thumbnail was being made
+    except Exception:
+        # The attachment stays usable without a thumbnail
+        logger.exception('Storing the thumbnail of attachment %s failed', attachment_id)
+    finally:
+        path.unlink(missing_ok=True)
+        close_old_connections()
+
+
+def cleanup_abandoned_uploads(max_age=None):
+    """
+    Delete uploads still incomplete, or complete but not linked to a message,
+    `max_age` seconds (UPLOAD_EXPIRY by default) after they started, and
+    partial files that belong to no upload or were last written before then.
+    Returns (attachments deleted, partial files removed).
+    """
+    config = get_config()
+    max_age = config['UPLOAD_EXPIRY'] if max_age is None else max_age
+    cutoff = timezone.now() - timedelta(seconds=max_age)
+
+    _, per_model = Attachment.objects.filter(
+        Q(is_complete=False) | Q(message__isnull=True), created_at__lt=cutoff,
+    ).delete()
+    deleted = per_model.get(Attachment._meta.label, 0)
+
+    directory = Path(config['UPLOAD_TEMP_DIR'])
+    parts = {}
+    for path in directory.glob('*.part') if directory.is_dir() else []:
+        try:
+            parts[int(path.stem)] = path
+        except ValueError:
+            continue
+    existing = set(Attachment.objects.filter(id__in=parts).values_list('id', flat=True))
+
+    removed = 0
+    for attachment_id, path in parts.items():
+        try:
+            if attachment_id not in existing or path.stat().st_mtime < cutoff.timestamp():
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            continue
+    return deleted, removed
+
+
+@receiver(post_delete, sender=Attachment)
+def delete_stored_files(sender, instance, **kwargs):
+    """Remove an attachment's file and thumbnail from storage once its deletion commits."""
+    files = [field_file for field_file in (instance.file, instance.thumbnail) if field_file]
+    if files:
+        transaction.on_commit(lambda: _delete_files(instance.id, files))
+
+
+def _delete_files(attachment_id, files):
+    for field_file in files:
+        try:
+            field_file.storage.delete(field_file.name)
+        except Exception:
+            logger.exception('Removing %s of deleted attachment %s failed', field_file.name, attachment_id)
+
+
+def link_attachments(message, user, attachment_ids):
+    """Attach the user's completed, unattached uploads to `message`."""
+    try:
+        attachment_ids = [int(i) for i in attachment_ids or []]
+    except (TypeError, ValueError):
+        attachment_ids = []
+    if not attachment_ids:
+        return []
+    Attachment.objects.filter(
+        id__in=attachment_ids,
+        uploader=user,
+        message__isnull=True,
+        is_complete=True,
+    ).update(message=message)
+    return [attachment_payload(a) for a in message.attachments.all()]
+
+
+def attachment_payload(attachment):
+    """Serializable attachment reference for chat_message events."""
+    return {
+        'id': attachment.id,
+        'name': attachment.original_name,
+        'size': attachment.size,
+        'content_type': attachment.content_type,
+        'url': reverse('chat:attachment', args=[attachment.id]),
+        'thumbnail_url': (
+            reverse('chat:attachment_thumbnail', args=[attachment.id])
+            if attachment.thumbnail else None
+        ),
+    }
+
+
+def can_view(user, attachment):
+    """Uploader, message participants and room members may download."""
+    if attachment.uploader_id == user.id:
+        return True
+    message = attachment.message
+    if message is None:
+        return False
+    if message.room_id:
+        return message.room.memberships.filter(user=user).exists()
+    return user.id in (message.sender_id, message.receiver_id)
+
+
+def parse_range(header, size):
+    """
+    Parse a single `bytes=` range. Returns (start, end) inclusive, None for
+    no/unsupported range, or raises ValueError when unsatisfiable.
+    """
+    match = RANGE_RE.match(header or '')
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        length = int(end)
+        if length == 0:
+            raise ValueError('Unsatisfiable range')
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError('Unsatisfiable range')
+    return start, end
+
+
+def iter_file_range(field, start, length):
+    """Yield `length` bytes of a stored file from `start` in blocks."""
+    with field.storage.open(field.name, 'rb') as fh:
+        fh.seek(start)
+        remaining = length
+        while remaining:
+            block = fh.read(min(READ_BLOCK, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
@@ -0,0 +1,123 @@
+"""
+Compression of large message bodies at rest.
+
+Bodies above a size threshold are stored compressed in
+Message.content_compressed, with only a short preview left in
+Message.content. Each blob starts with a one-byte codec marker so rows
+written with different settings can always be read back.
+
+zstd (and trained dictionaries) need the optional `zstandard` package;
+without it everything is written with zlib. New rows use DICTIONARY;
+rows written with earlier dictionaries stay readable as long as those are
+listed in RETIRED_DICTIONARIES.
+"""
+import zlib
+
+from django.conf import settings
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+DEFAULTS = {
+    'THRESHOLD': 1024,   # bytes of UTF-8 before a body is compressed
+    'PREVIEW_CHARS': 200,
+    'CODEC': 'zlib',     # 'zlib' or 'zstd'
+    'LEVEL': 6,
+    'DICTIONARY': None,  # path to a trained zstd dictionary
+    'RETIRED_DICTIONARIES': [],  # paths of earlier dictionaries, for reading only
+}
+
+ZLIB = b'z'
+ZSTD = b's'
+ZSTD_DICT = b'd'
+
+_dictionaries = None
+
+
+def get_config():
+    """Return compression settings merged over the defaults."""
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'CHAT_MESSAGE_COMPRESSION', {}))
+    return config
+
+
+def get_dictionaries():
+    """
+    Load the configured and retired zstd dictionaries once per process.
+    Returns (current dictionary or None, {dict_id: dictionary}).
+    """
+    global _dictionaries
+    config = get_config()
+    paths = (config['DICTIONARY'], *config['RETIRED_DICTIONARIES'])
+    if zstandard is None:
+        return None, {}
+    if _dictionaries is None or _dictionaries[0] != paths:
+        loaded = {}
+        for path in filter(None, paths):
+            with open(path, 'rb') as fh:
+                loaded[path] = zstandard.ZstdCompressionDict(fh.read())
+        current = loaded.get(config['DICTIONARY'])
+        by_id = {dictionary.dict_id(): dictionary for dictionary in loaded.values()}
+        _dictionaries = (paths, current, by_id)
+    return _dictionaries[1], _dictionaries[2]
+
+
+def get_dictionary():
+    """The zstd dictionary new rows are compressed with, if any."""
+    return get_dictionaries()[0]
+
+
+def should_compress(text):
+    return len(text.encode('utf-8')) >= get_config()['THRESHOLD']
+
+
+def make_preview(text):
+    return text[:get_config()['PREVIEW_CHARS']]
+
+
+def compress(text):
+    """Compress `text` with the configured codec, prefixed by its marker."""
+    config = get_config()
+    data = text.encode('utf-8')
+
+    if config['CODEC'] == 'zstd' and zstandard is not None:
+        dictionary = get_dictionary()
+        if dictionary is not None:
+            compressor = zstandard.ZstdCompressor(level=config['LEVEL'], dict_data=dictionary)
+            return ZSTD_DICT + compressor.compress(data)
+        return ZSTD + zstandard.ZstdCompressor(level=config['LEVEL']).compress(data)
+
+    return ZLIB + zlib.compress(data, config['LEVEL'])
+
+
+def decompress(blob):
+    """Decompress a blob written by compress()."""
+    blob = bytes(blob)
+    marker, payload = blob[:1], blob[1:]
+
+    if marker == ZLIB:
+        return zlib.decompress(payload).decode('utf-8')
+
+    if zstandard is None:
+        raise RuntimeError('The zstandard package is required to read zstd-compressed messages.')
+    if marker == ZSTD:
+        return zstandard.ZstdDecompressor().decompress(payload).decode('utf-8')
+    if marker == ZSTD_DICT:
+        frame_dict_id = zstandard.get_frame_parameters(payload).dict_id
+        dictionary = get_dictionaries()[1].get(frame_dict_id)
+        if dictionary is None:
+            raise RuntimeError(f'Message was compressed with zstd dictionary {frame_dict_id}, which is '
+                               f'neither DICTIONARY nor one of RETIRED_DICTIONARIES.')
+        return zstandard.ZstdDecompressor(dict_data=dictionary).decompress(payload).decode('utf-8')
+
+    raise ValueError(f'Unknown compression marker {marker!r}')
+
+
+def train_dictionary(samples, size=112640):
+    """Train a zstd dictionary from an iterable of message bodies."""
+    if zstandard is None:
+        raise RuntimeError('The zstandard package is required to train a dictionary.')
+    return zstandard.train_dictionary(size, [s.encode('utf-8') for s in samples])
@@ -2,12 +2,83 @@
 WebSocket Consumer for real-time chat.
 Handles message sending/receiving, typing indicators,
 read receipts, message deletion, and online status.
+Batch frames (`delete_messages`, `ack`) cost a fixed number of queries
+(select the ids, then one UPDATE or one collector delete) whatever their
+size, and are broadcast as one event per room.
 """
 import json
+import re
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.utils import timezone
 
+from . import drain
+from .outbound import FLOW_EXTENSION, OutboundQueue
+from .ratelimit import get_limiter
+
+# Close code sent to clients that stay over the outbound queue limit
+SLOW_CONSUMER_CLOSE_CODE = 4008
+
+# Frame type -> rate limit bucket
+RATE_LIMITED_ACTIONS = {
+    'chat_message': 'message',
+    'typing': 'typing',
+    'mark_read': 'read',
+    'ack': 'read',
+    'delete_message': 'delete',
+    'delete_messages': 'delete',
+}
+
+# Most ids or conversations accepted in one batch frame
+BATCH_LIMIT = 500
+
+
+def parse_ids(values, limit=BATCH_LIMIT):
+    """Distinct integer ids from a client-supplied list, capped at `limit`."""
+    ids = {}
+    for value in values[:limit] if isinstance(values, list) else []:
+        try:
+            ids[int(value)] = None
+        except (TypeError, ValueError):
+            continue
+    return list(ids)
+
+
+def parse_acks(entries, key, limit=BATCH_LIMIT):
+    """
+    Turn `[{key: id, "message_id": up_to}, ...]` into `{id: up_to}`.
+    A missing `message_id` means "everything"; up_to is then None.
+    """
+    acks = {}
+    for entry in entries[:limit] if isinstance(entries, list) else []:
+        if not isinstance(entry, dict):
+            continue
+        try:
+            target = int(entry.get(key))
+            up_to = entry.get('message_id')
+            up_to = int(up_to) if up_to is not None else None
+        except (TypeError, ValueError):
+            continue
+        acks[target] = up_to
+    return acks
+
+
+def conversation_group_name(user_id, other_user_id):
+    """Group of the direct conversation between two users (room name from chat_room_view)."""
+    low, high = sorted([int(user_id), int(other_user_id)])
+    return f'chat_chat_{low}_{high}'
+
+
+def conversation_partner(room_name, user_id):
+    """The other user of a `chat_<low>_<high>` room, or None if `user_id` is not one of the two."""
+    match = re.fullmatch(r'chat_(\d+)_(\d+)', room_name)
+    if match is None:
+        return None
+    low, high = int(match[1]), int(match[2])
+    if low == high or user_id not in (low, high):
+        return None
+    return high if user_id == low else low
+
 
 class ChatConsumer(AsyncWebsocketConsumer):
     """
@@ -24,7 +95,18 @@ class ChatConsumer(AsyncWebsocketConsumer):
             await self.close()
             return
 
+        # A draining worker sends new sockets to its replacement
+        if drain.is_draining():
+            await self.close(code=drain.RESTART_CLOSE_CODE)
+            return
+
         self.room_name = self.scope['url_route']['kwargs']['room_name']
+        # Deletes and read receipts are scoped to this conversation
+        self.other_user_id = conversation_partner(self.room_name, self.user.id)
+        if self.other_user_id is None:
+            await self.close()
+            return
+
         self.room_group_name = f'chat_{self.room_name}'
 
         # Join room group
@@ -38,6 +120,10 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
         await self.accept()
 
+        # Buffer outbound frames so a slow client can't back up the channel layer
+        self.start_outbound()
+        drain.register(self)
+
         # Notify the room that user is online
         await self.channel_layer.group_send(
             self.room_group_name,
@@ -51,6 +137,10 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
     async def disconnect(self, close_code):
         """Leave room group and update status on disconnect."""
+        drain.unregister(self)
+        if hasattr(self, 'outbound'):
+            await self.outbound.stop()
+
         if hasattr(self, 'room_group_name'):
             # Update user online status
             await self.set_user_online(False)
@@ -74,84 +164,123 @@ class ChatConsumer(AsyncWebsocketConsumer):
     async def receive(self, text_data):
         """
         Handle incoming WebSocket messages.
-        Supports: chat_message, typing, mark_read, delete_message
+        Supports: chat_message, typing, mark_read, ack, delete_message,
+        delete_messages; each is handled by the matching `on_<type>` method.
         """
         data = json.loads(text_data)
         message_type = data.get('type', 'chat_message')
 
-        if message_type == 'chat_message':
-            content = data.get('message', '').strip()
+        if not await self.check_rate_limit(message_type):
+            return
+
+        if message_type in RATE_LIMITED_ACTIONS:
+            await getattr(self, f'on_{message_type}')(data)
 
-            # Prevent empty messages
-            if not content:
-                return
+    # ---- Client frame handlers ----
 
-            receiver_id = data.get('receiver_id')
+    async def on_chat_message(self, data):
+        content = data.get('message', '').strip()
+        attachment_ids = data.get('attachment_ids') or []
 
-            # Save message to database
-            message_obj = await self.save_message(receiver_id, content)
+        # Prevent empty messages
+        if not content and not attachment_ids:
+            return
 
-            # Send message to room group
+        # Save message to database; the receiver is always this conversation's
+        # other user, whatever `receiver_id` the client sent
+        message_obj = await self.save_message(content, attachment_ids)
+
+        # Send message to room group
+        await self.channel_layer.group_send(
+            self.room_group_name,
+            {
+                'type': 'chat_message',
+                'message_id': message_obj['id'],
+                'message': content,
+                'sender_id': self.user.id,
+                'sender_username': self.user.username,
+                'receiver_id': self.other_user_id,
+                'timestamp': message_obj['timestamp'],
+                'is_read': False,
+                'attachments': message_obj['attachments'],
+            }
+        )
+
+    async def on_typing(self, data):
+        # Send typing indicator to the room
+        await self.channel_layer.group_send(
+            self.room_group_name,
+            {
+                'type': 'typing_indicator',
+                'user_id': self.user.id,
+                'username': self.user.username,
+                'is_typing': data.get('is_typing', False),
+            }
+        )
+
+    async def on_mark_read(self, data):
+        # Mark messages as read, optionally only up to `message_id`
+        read_up_to = await self.mark_messages_read(data.get('message_id'))
+
+        # Notify the sender, naming only the newest message actually marked read
+        if read_up_to is not None:
             await self.channel_layer.group_send(
                 self.room_group_name,
                 {
-                    'type': 'chat_message',
-                    'message_id': message_obj['id'],
-                    'message': content,
-                    'sender_id': self.user.id,
-                    'sender_username': self.user.username,
-                    'receiver_id': receiver_id,
-                    'timestamp': message_obj['timestamp'],
-                    'is_read': False,
+                    'type': 'messages_read',
+                    'reader_id': self.user.id,
+                    'sender_id': self.other_user_id,
+                    'message_id': read_up_to,
                 }
             )
 
-        elif message_type == 'typing':
-            # Send typing indicator to the room
+    async def on_ack(self, data):
+        # Catch up on several conversations at once:
+        # {"conversations": [{"sender_id": 3, "message_id": 120}, ...]}
+        acks = parse_acks(data.get('conversations'), 'sender_id')
+        for sender_id, read_up_to in (await self.acknowledge(acks)).items():
             await self.channel_layer.group_send(
-                self.room_group_name,
+                conversation_group_name(self.user.id, sender_id),
                 {
-                    'type': 'typing_indicator',
-                    'user_id': self.user.id,
-                    'username': self.user.username,
-                    'is_typing': data.get('is_typing', False),
+                    'type': 'messages_read',
+                    'reader_id': self.user.id,
+                    'sender_id': sender_id,
+                    'message_id': read_up_to,
                 }
             )
 
-        elif message_type == 'mark_read':
-            # Mark messages as read
-            sender_id = data.get('sender_id')
-            await self.mark_messages_read(sender_id)
+    async def on_delete_message(self, data):
+        message_id = data.get('message_id')
+        deleted = await self.delete_message(message_id)
 
-            # Notify the sender that messages were read
+        if deleted:
             await self.channel_layer.group_send(
                 self.room_group_name,
                 {
-                    'type': 'messages_read',
-                    'reader_id': self.user.id,
-                    'sender_id': sender_id,
+                    'type': 'message_deleted',
+                    'message_id': message_id,
+                    'deleted_by': self.user.id,
                 }
             )
 
-        elif message_type == 'delete_message':
-            message_id = data.get('message_id')
-            deleted = await self.delete_message(message_id)
+    async def on_delete_messages(self, data):
+        deleted = await self.delete_messages(parse_ids(data.get('message_ids')))
 
-            if deleted:
-                await self.channel_layer.group_send(
-                    self.room_group_name,
-                    {
-                        'type': 'message_deleted',
-                        'message_id': message_id,
-                        'deleted_by': self.user.id,
-                    }
-                )
+        if deleted:
+            await self.channel_layer.group_send(
+                self.room_group_name,
+                {
+                    'type': 'messages_deleted',
+                    'message_ids': deleted,
+                    'deleted_by': self.user.id,
+                }
+            )
 
     # ---- Group message handlers ----
 
     async def chat_message(self, event):
         """Send chat message to WebSocket."""
-        await self.send(text_data=json.dumps({
+        await self.outbound.put(json.dumps({
             'type': 'chat_message',
             'message_id': event['message_id'],
             'message': event['message'],
@@ -160,53 +289,104 @@ class ChatConsumer(AsyncWebsocketConsumer):
             'receiver_id': event['receiver_id'],
             'timestamp': event['timestamp'],
             'is_read': event['is_read'],
+            'attachments': event.get('attachments', []),
         }))
 
     async def typing_indicator(self, event):
         """Send typing indicator to WebSocket."""
         # Don't send typing indicator to the person who is typing
         if event['user_id'] != self.user.id:
-            await self.send(text_data=json.dumps({
+            await self.outbound.put(json.dumps({
                 'type': 'typing',
                 'user_id': event['user_id'],
                 'username': event['username'],
                 'is_typing': event['is_typing'],
-            }))
+            }), key=('typing', event['user_id']))
 
     async def messages_read(self, event):
         """Send read receipt notification to WebSocket."""
-        await self.send(text_data=json.dumps({
+        await self.outbound.put(json.dumps({
             'type': 'messages_read',
             'reader_id': event['reader_id'],
             'sender_id': event['sender_id'],
+            'message_id': event.get('message_id'),
         }))
 
     async def user_status(self, event):
         """Send user online/offline status to WebSocket."""
-        await self.send(text_data=json.dumps({
+        await self.outbound.put(json.dumps({
             'type': 'user_status',
             'user_id': event['user_id'],
             'username': event['username'],
             'is_online': event['is_online'],
-        }))
+        }), key=('user_status', event['user_id']))
 
     async def message_deleted(self, event):
         """Send message deletion notification to WebSocket."""
-        await self.send(text_data=json.dumps({
+        await self.outbound.put(json.dumps({
             'type': 'message_deleted',
             'message_id': event['message_id'],
             'deleted_by': event['deleted_by'],
         }))
 
+    async def messages_deleted(self, event):
+        """Send a batch deletion notification to WebSocket."""
+        await self.outbound.put(json.dumps({
+            'type': 'messages_deleted',
+            'message_ids': event['message_ids'],
+            'deleted_by': event['deleted_by'],
+        }))
+
+    async def check_rate_limit(self, message_type):
+        """Take a token for this frame; tell the client when it is over its limit."""
+        action = RATE_LIMITED_ACTIONS.get(message_type)
+        if action is None:
+            return True
+        decision = await get_limiter().acheck(self.user.id, action)
+        if not decision.allowed:
+            await self.outbound.put(json.dumps({
+                'type': 'rate_limited',
+                'action': message_type,
+                'retry_after': round(decision.retry_after, 3),
+            }), key=('rate_limited', message_type))
+        return decision.allowed
+
+    def start_outbound(self):
+        """Start the outbound queue, paced by the socket's flow control when the server provides it."""
+        self.outbound = OutboundQueue(
+            self.send,
+            self.disconnect_slow_consumer,
+            flow=self.scope.get('extensions', {}).get(FLOW_EXTENSION),
+            on_error=self.close_after_send_error,
+        )
+        self.outbound.start()
+
+    async def close_after_send_error(self):
+        """Close a socket whose outbound writer failed, instead of queueing into it forever."""
+        await self.close(code=1011)
+
+    async def disconnect_slow_consumer(self):
+        """
+        Disconnect a client that stayed over the outbound queue limit.
+        The reconnect frame tells it to resume by refetching missed messages.
+        """
+        await self.send(text_data=json.dumps({
+            'type': 'reconnect',
+            'reason': 'slow_consumer',
+            'resume': 'refetch',
+        }))
+        await self.close(code=SLOW_CONSUMER_CLOSE_CODE)
+
     # ---- Database operations (sync_to_async) ----
 
     @database_sync_to_async
-    def save_message(self, receiver_id, content):
-        """Save a chat message to the database."""
+    def save_message(self, content, attachment_ids=None):
+        """Save a message to the other user and link its attachments."""
         from accounts.models import CustomUser
+        from .attachments import link_attachments
         from .models import Message
 
-        receiver = CustomUser.objects.get(id=receiver_id)
+        receiver = CustomUser.objects.get(id=self.other_user_id)
         message = Message.objects.create(
             sender=self.user,
             receiver=receiver,
@@ -215,17 +395,52 @@ class ChatConsumer(AsyncWebsocketConsumer):
         return {
             'id': message.id,
             'timestamp': message.timestamp.strftime('%b %d, %Y %I:%M %p'),
+            'attachments': link_attachments(message, self.user, attachment_ids),
         }
 
     @database_sync_to_async
-    def mark_messages_read(self, sender_id):
-        """Mark all messages from a sender to this user as read."""
+    def mark_messages_read(self, up_to=None):
+        """
+        Mark the other user's messages to this user as read, up to `up_to` if
+        given. Returns the newest id marked read, or None if nothing changed.
+        """
+        try:
+            acks = {self.other_user_id: int(up_to) if up_to is not None else None}
+        except (TypeError, ValueError):
+            return None
+        return self._mark_read(acks).get(self.other_user_id)
+
+    @database_sync_to_async
+    def acknowledge(self, acks):
+        """Mark several conversations read; returns {sender_id: newest id marked read}."""
+        return self._mark_read(acks)
+
+    def _mark_read(self, acks):
+        """
+        One UPDATE for every {sender_id: up_to} pair. The ids are selected first
+        so each sender is told only about messages that actually changed.
+        """
+        from django.db.models import Q
         from .models import Message
-        Message.objects.filter(
-            sender_id=sender_id,
-            receiver=self.user,
-            is_read=False
-        ).update(is_read=True)
+
+        if not acks:
+            return {}
+        query = Q()
+        for sender_id, up_to in acks.items():
+            condition = Q(sender_id=sender_id)
+            if up_to is not None:
+                condition &= Q(id__lte=up_to)
+            query |= condition
+
+        unread = {}
+        rows = Message.objects.filter(query, receiver=self.user, is_read=False).values_list('id', 'sender_id')
+        for message_id, sender_id in rows:
+            unread.setdefault(sender_id, []).append(message_id)
+        if unread:
+            Message.objects.filter(
+                id__in=[message_id for ids in unread.values() for message_id in ids]
+            ).update(is_read=True)
+        return {sender_id: max(ids) for sender_id, ids in unread.items()}
 
     @database_sync_to_async
     def set_user_online(self, is_online):
@@ -238,11 +453,270 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
     @database_sync_to_async
     def delete_message(self, message_id):
-        """Delete a message (only if the current user is the sender)."""
+        """Delete a message of this conversation (only if the current user is the sender)."""
         from .models import Message
         try:
-            message = Message.objects.get(id=message_id, sender=self.user)
-            message.delete()
-            return True
-        except Message.DoesNotExist:
+            message_id = int(message_id)
+        except (TypeError, ValueError):
+            return False
+        deleted, _ = Message.objects.filter(
+            id=message_id, sender=self.user, receiver_id=self.other_user_id, room__isnull=True,
+        ).only('id').delete()
+        return deleted > 0
+
+    @database_sync_to_async
+    def delete_messages(self, message_ids):
+        """Delete this user's messages in this conversation among `message_ids`; returns the ids deleted."""
+        from .models import Message
+
+        if not message_ids:
+            return []
+        ids = list(Message.objects.filter(
+            id__in=message_ids, sender=self.user, receiver_id=self.other_user_id, room__isnull=True,
+        ).values_list('id', flat=True))
+        if not ids:
+            return []
+        # The delete collector only needs ids to cascade to attachments
+        Message.objects.filter(id__in=ids).only('id').delete()
+        return ids
+
+
+class RoomConsumer(ChatConsumer):
+    """
+    Async WebSocket consumer for group rooms.
+    Each message is written once and fanned out through the room's channel
+    layer group; read state is a per-member watermark, not per-message rows.
+    """
+
+    async def connect(self):
+        """Accept connection only for authenticated members of the room."""
+        self.user = self.scope['user']
+
+        if self.user.is_anonymous:
+            await self.close()
+            return
+
+        if drain.is_draining():
+            await self.close(code=drain.RESTART_CLOSE_CODE)
+            return
+
+        self.room_id = int(self.scope['url_route']['kwargs']['room_id'])
+        if not await self.is_member():
+            await self.close()
+            return
+
+        from .models import Room
+        self.room_group_name = Room.group_name_for(self.room_id)
+
+        await self.channel_layer.group_add(
+            self.room_group_name,
+            self.channel_name
+        )
+
+        await self.set_user_online(True)
+
+        await self.accept()
+
+        self.start_outbound()
+        drain.register(self)
+
+        await self.channel_layer.group_send(
+            self.room_group_name,
+            {
+                'type': 'user_status',
+                'user_id': self.user.id,
+                'username': self.user.username,
+                'is_online': True,
+            }
+        )
+
+    # ---- Client frame handlers (typing and deletes are shared) ----
+
+    async def on_chat_message(self, data):
+        content = data.get('message', '').strip()
+        attachment_ids = data.get('attachment_ids') or []
+
+        if not content and not attachment_ids:
+            return
+
+        message_obj = await self.save_room_message(content, attachment_ids)
+
+        await self.channel_layer.group_send(
+            self.room_group_name,
+            {
+                'type': 'chat_message',
+                'message_id': message_obj['id'],
+                'message': content,
+                'sender_id': self.user.id,
+                'sender_username': self.user.username,
+                'room_id': self.room_id,
+                'timestamp': message_obj['timestamp'],
+                'attachments': message_obj['attachments'],
+            }
+        )
+
+    async def on_mark_read(self, data):
+        # Advance the watermark to `message_id`, or to the latest message if omitted
+        read_up_to = await self.advance_read_watermark(data.get('message_id'))
+
+        if read_up_to is not None:
+            await self.channel_layer.group_send(
+                self.room_group_name,
+                {
+                    'type': 'read_watermark',
+                    'reader_id': self.user.id,
+                    'message_id': read_up_to,
+                }
+            )
+
+    async def on_ack(self, data):
+        # Advance watermarks in several rooms at once:
+        # {"rooms": [{"room_id": 4, "message_id": 120}, ...]}
+        from .models import Room
+        acks = parse_acks(data.get('rooms'), 'room_id')
+        advanced = await self.advance_read_watermarks(acks)
+        for room_id, message_id in advanced.items():
+            await self.channel_layer.group_send(
+                Room.group_name_for(room_id),
+                {
+                    'type': 'read_watermark',
+                    'reader_id': self.user.id,
+                    'message_id': message_id,
+                }
+            )
+
+    # ---- Group message handlers ----
+
+    async def chat_message(self, event):
+        """Send room message to WebSocket."""
+        await self.outbound.put(json.dumps({
+            'type': 'chat_message',
+            'message_id': event['message_id'],
+            'message': event['message'],
+            'sender_id': event['sender_id'],
+            'sender_username': event['sender_username'],
+            'room_id': event['room_id'],
+            'timestamp': event['timestamp'],
+            'attachments': event.get('attachments', []),
+        }))
+
+    async def read_watermark(self, event):
+        """Send a member's new read watermark to WebSocket."""
+        await self.outbound.put(json.dumps({
+            'type': 'read_watermark',
+            'reader_id': event['reader_id'],
+            'message_id': event['message_id'],
+        }), key=('read_watermark', event['reader_id']))
+
+    # ---- Database operations (sync_to_async) ----
+
+    @database_sync_to_async
+    def is_member(self):
+        """Check that the current user belongs to the room."""
+        from .models import Membership
+        return Membership.objects.filter(room_id=self.room_id, user=self.user).exists()
+
+    @database_sync_to_async
+    def save_room_message(self, content, attachment_ids=None):
+        """Save a room message once, regardless of member count."""
+        from .attachments import link_attachments
+        from .models import Message
+
+        message = Message.objects.create(
+            sender=self.user,
+            room_id=self.room_id,
+            content=content,
+        )
+        return {
+            'id': message.id,
+            'timestamp': message.timestamp.strftime('%b %d, %Y %I:%M %p'),
+            'attachments': link_attachments(message, self.user, attachment_ids),
+        }
+
+    @database_sync_to_async
+    def advance_read_watermark(self, message_id=None):
+        """
+        Move this member's read watermark forward, never backwards; up to the
+        room's latest message if `message_id` is None. Returns the new
+        watermark, or None if it did not move.
+        """
+        try:
+            acks = {self.room_id: int(message_id) if message_id is not None else None}
+        except (TypeError, ValueError):
+            return None
+        return self._advance_read_watermarks(acks).get(self.room_id)
+
+    @database_sync_to_async
+    def advance_read_watermarks(self, acks):
+        """Returns {room_id: message_id} for the rooms whose watermark moved."""
+        return self._advance_read_watermarks(acks)
+
+    def _advance_read_watermarks(self, acks):
+        """
+        Move this member's watermark in several rooms with one UPDATE.
+        An ack without a message id (None) means "up to the room's latest message".
+        """
+        from django.db.models import Case, F, Max, When
+        from .models import Membership, Message
+
+        # Only acknowledge real messages of rooms the user belongs to
+        messages = Message.objects.filter(room__memberships__user=self.user)
+        targets = {
+            room_id: message_id
+            for message_id, room_id in messages.filter(
+                id__in=[m for m in acks.values() if m is not None],
+            ).values_list('id', 'room_id')
+            if acks.get(room_id) == message_id
+        }
+        everything = [room_id for room_id, message_id in acks.items() if message_id is None]
+        if everything:
+            targets.update(
+                messages.filter(room_id__in=everything).values('room_id').annotate(
+                    latest=Max('id'),
+                ).values_list('room_id', 'latest')
+            )
+        if not targets:
+            return {}
+
+        memberships = Membership.objects.filter(user=self.user, room_id__in=targets)
+        advanced = {
+            room_id: targets[room_id]
+            for room_id, last_read in memberships.values_list('room_id', 'last_read_message_id')
+            if last_read < targets[room_id]
+        }
+        if advanced:
+            memberships.filter(room_id__in=advanced).update(last_read_message_id=Case(
+                *(
+                    When(room_id=room_id, last_read_message_id__lt=message_id, then=message_id)
+                    for room_id, message_id in advanced.items()
+                ),
+                default=F('last_read_message_id'),
+                output_field=Membership._meta.get_field('last_read_message_id'),
+            ))
+        return advanced
+
+    @database_sync_to_async
+    def delete_message(self, message_id):
+        """Delete a message of this room (only if the current user is the sender)."""
+        from .models import Message
+        try:
+            message_id = int(message_id)
+        except (TypeError, ValueError):
             return False
+        deleted, _ = Message.objects.filter(
+            id=message_id, room_id=self.room_id, sender=self.user,
+        ).only('id').delete()
+        return deleted > 0
+
+    @database_sync_to_async
+    def delete_messages(self, message_ids):
+        """Delete this user's messages in this room; returns the ids deleted."""
+        from .models import Message
+
+        if not message_ids:
+            return []
+        messages = Message.objects.filter(id__in=message_ids, room_id=self.room_id, sender=self.user)
+        deleted = list(messages.values_list('id', flat=True))
+        if deleted:
+            Message.objects.filter(id__in=deleted).only('id').delete()
+        return deleted
@@ -0,0 +1,148 @@
+"""
+Graceful WebSocket draining when a worker is shut down.
+
+On SIGTERM the worker stops accepting sockets, tells each connected client
+to reconnect after a randomized delay, flushes its outbound queue and
+closes sockets in paced batches, until none are left or TIMEOUT passes.
+Only then is the signal handed back to the server's own handler, so a
+deploy doesn't turn into a thundering herd of reconnects and
+`set_user_online` writes. A second SIGTERM ends the drain at once.
+"""
+import asyncio
+import json
+import os
+import random
+import signal
+import weakref
+
+from django.conf import settings
+
+
+DEFAULTS = {
+    'BATCH_SIZE': 50,
+    'BATCH_INTERVAL': 0.5,    # seconds between closing batches
+    'RECONNECT_SPREAD': 10.0,  # clients reconnect after a random delay up to this
+    'FLUSH_TIMEOUT': 2.0,     # seconds to wait for a socket's queued frames
+    'TIMEOUT': 25.0,          # give up draining after this; keep it under the platform's grace period
+}
+
+# WebSocket close code 1012: Service Restart
+RESTART_CLOSE_CODE = 1012
+
+_connections = weakref.WeakSet()
+_draining = False
+_installed = False
+_drain_task = None
+
+
+def get_config():
+    """Return drain settings merged over the defaults."""
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'CHAT_DRAIN', {}))
+    return config
+
+
+def is_draining():
+    return _draining
+
+
+def register(consumer):
+    """Track an accepted connection and install the SIGTERM hook on first use."""
+    _connections.add(consumer)
+    install()
+
+
+def unregister(consumer):
+    _connections.discard(consumer)
+
+
+def install():
+    """
+    Take over SIGTERM on the running event loop.
+    Done lazily from the first connection because the server installs its own
+    handler at startup; that handler and the signal wakeup fd are kept and
+    restored once draining is done.
+    """
+    global _installed
+    if _installed:
+        return
+    loop = asyncio.get_running_loop()
+    previous = signal.getsignal(signal.SIGTERM)
+    try:
+        # add_signal_handler swaps in the loop's own wakeup fd; remember the reactor's
+        previous_wakeup_fd = signal.set_wakeup_fd(-1)
+        signal.set_wakeup_fd(previous_wakeup_fd)
+        loop.add_signal_handler(signal.SIGTERM, _on_sigterm, loop, previous, previous_wakeup_fd)
+    except (NotImplementedError, RuntimeError, ValueError):
+        return  # Not the main thread, or no signal support (e.g. Windows)
+    _installed = True
+
+
+def _on_sigterm(loop, previous, previous_wakeup_fd):
+    global _drain_task
+    if _drain_task is not None:
+        # Second SIGTERM: stop draining and shut down now
+        _drain_task.cancel()
+        return
+    _drain_task = loop.create_task(drain_connections())
+    _drain_task.add_done_callback(lambda _: _hand_back(loop, previous, previous_wakeup_fd))
+
+
+def _hand_back(loop, previous, previous_wakeup_fd):
+    """Restore the server's SIGTERM handler and wakeup fd, then re-deliver the signal to it."""
+    loop.remove_signal_handler(signal.SIGTERM)
+    # Removing the last loop handler resets the wakeup fd to -1, which would
+    # leave the reactor asleep through the signal delivered below
+    signal.set_wakeup_fd(previous_wakeup_fd)
+    signal.signal(signal.SIGTERM, previous if previous is not None else signal.SIG_DFL)
+    os.kill(os.getpid(), signal.SIGTERM)
+
+
+async def drain_connections():
+    """
+    Ask every connected client to reconnect elsewhere, in paced batches.
+    Sockets that finish connecting mid-drain are picked up by the next batch.
+    """
+    global _draining
+    _draining = True
+    config = get_config()
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + config['TIMEOUT']
+
+    while _connections:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            break
+        batch = list(_connections)[:config['BATCH_SIZE']]
+        tasks = [loop.create_task(_drain_one(consumer, config)) for consumer in batch]
+        try:
+            _, pending = await asyncio.wait(tasks, timeout=remaining)
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    task.exception()  # A socket that failed to close is given up on
+        if pending:
+            break
+        if _connections:
+            await asyncio.sleep(config['BATCH_INTERVAL'])
+
+
+async def _drain_one(consumer, config):
+    try:
+        outbound = getattr(consumer, 'outbound', None)
+        frame = json.dumps({
+            'type': 'reconnect',
+            'reason': 'server_restart',
+            'delay_ms': int(random.uniform(0, config['RECONNECT_SPREAD']) * 1000),
+        })
+        if outbound is not None:
+            await outbound.put(frame)
+            await outbound.flush(config['FLUSH_TIMEOUT'])
+        else:
+            await consumer.send(text_data=frame)
+        await consumer.close(code=RESTART_CLOSE_CODE)
+    finally:
+        # Never retry a socket, even one whose close failed
+        unregister(consumer)
@@ -0,0 +1,110 @@
+"""
+Streaming export of a user's conversation history.
+Rows are read with QuerySet.iterator() and encoded one at a time, so memory
+use stays flat regardless of how many messages a user has.
+"""
+import csv
+import json
+import zlib
+
+from asgiref.sync import sync_to_async
+from django.db.models import Q
+
+from .models import Message, Room
+
+
+CHUNK_SIZE = 2000  # rows fetched per database round trip
+FLUSH_BYTES = 64 * 1024  # bytes buffered before yielding a response chunk
+
+CSV_FIELDS = ['id', 'timestamp', 'sender', 'receiver', 'room', 'content', 'is_read']
+
+EXPORT_FORMATS = {
+    'ndjson': {'content_type': 'application/x-ndjson', 'extension': 'ndjson'},
+    'csv': {'content_type': 'text/csv', 'extension': 'csv'},
+}
+
+
+def user_messages(user):
+    """All one-to-one and room messages visible to `user`, oldest first."""
+    rooms = Room.objects.filter(memberships__user=user).values('id')
+    return Message.objects.filter(
+        Q(sender=user) | Q(receiver=user) | Q(room__in=rooms)
+    ).select_related('sender', 'receiver', 'room').order_by('id')
+
+
+def iter_records(user, chunk_size=CHUNK_SIZE):
+    """Yield one dict per message without caching the queryset."""
+    for msg in user_messages(user).iterator(chunk_size=chunk_size):
+        yield {
+            'id': msg.id,
+            'timestamp': msg.timestamp.isoformat(),
+            'sender': msg.sender.username,
+            'receiver': msg.receiver.username if msg.receiver_id else None,
+            'room': msg.room.name if msg.room_id else None,
+            'content': msg.body,
+            'is_read': msg.is_read,
+        }
+
+
+class _Echo:
+    """File-like object whose write() returns the value, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def iter_ndjson(records):
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + '\n'
+
+
+def iter_csv(records):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_FIELDS)
+    for record in records:
+        yield writer.writerow([record[field] for field in CSV_FIELDS])
+
+
+def export_chunks(user, fmt='ndjson', compress=False, chunk_size=CHUNK_SIZE):
+    """
+    Yield encoded export bytes in chunks of roughly FLUSH_BYTES.
+    With `compress`, output is a gzip stream compressed on the fly.
+    """
+    lines = iter_csv if fmt == 'csv' else iter_ndjson
+    compressor = zlib.compressobj(wbits=31) if compress else None
+
+    buffer = []
+    size = 0
+    for line in lines(iter_records(user, chunk_size)):
+        data = line.encode('utf-8')
+        buffer.append(data)
+        size += len(data)
+        if size >= FLUSH_BYTES:
+            chunk = b''.join(buffer)
+            buffer = []
+            size = 0
+            if compressor is not None:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+
+    chunk = b''.join(buffer)
+    if compressor is not None:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
+
+
+async def aiter_chunks(chunks):
+    """
+    Adapt a sync chunk generator for StreamingHttpResponse under ASGI.
+    Django buffers sync iterators in full when serving over ASGI, so each
+    chunk is pulled in the thread-sensitive executor instead.
+    """
+    sentinel = object()
+    pull = sync_to_async(next)
+    while True:
+        chunk = await pull(chunks, sentinel)
+        if chunk is sentinel:
+            break
+        yield chunk
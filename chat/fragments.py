@@ -0,0 +1,54 @@
+"""
+Template fragment caching for message bubbles and inbox rows.
+
+The keys are versioned by the state a fragment shows. A bubble in chat.html
+is cached per message id, viewer, read flag and attachment state
+(`Message.attachment_state`). The last-message preview in user_list.html
+is cached per viewer, last-message id and read flag. Sending, reading,
+thumbnailing or deleting a message therefore changes the key, and the
+stale fragment simply expires. Only an edit to a message's text keeps the
+key, so edits call `invalidate_messages`.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+
+
+BUBBLE_FRAGMENT = 'message_bubble'
+INBOX_ROW_FRAGMENT = 'inbox_row'
+
+DEFAULT_TIMEOUT = 24 * 60 * 60
+
+
+def get_timeout():
+    """Seconds a rendered fragment is kept."""
+    return getattr(settings, 'CHAT_FRAGMENT_CACHE_TIMEOUT', DEFAULT_TIMEOUT)
+
+
+def fragment_keys(messages, user_ids):
+    """Cache keys of every fragment showing one of `messages`, in its current state, to one of `user_ids`."""
+    keys = []
+    for message in messages:
+        for user_id in user_ids:
+            keys.append(make_template_fragment_key(
+                BUBBLE_FRAGMENT, [message.id, user_id, message.is_read, message.attachment_state],
+            ))
+            keys.append(make_template_fragment_key(
+                INBOX_ROW_FRAGMENT, [user_id, message.id, message.is_read],
+            ))
+    return keys
+
+
+def invalidate_messages(message_ids, *user_ids):
+    """
+    Drop cached bubbles and inbox previews of messages exchanged by `user_ids`
+    (the sender and receiver of a direct message).
+    """
+    from .models import Message
+
+    message_ids = [message_id for message_id in message_ids if message_id is not None]
+    if message_ids:
+        messages = Message.objects.filter(id__in=message_ids).only('id', 'is_read').prefetch_related(
+            'attachments'
+        )
+        cache.delete_many(fragment_keys(messages, user_ids))
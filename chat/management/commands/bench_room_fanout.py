@@ -0,0 +1,121 @@
+"""
+Benchmark group room send latency as room size grows.
+
+Each simulated member is a channel in the room's channel layer group, as a
+connected RoomConsumer would be. A send is one Message insert plus one
+group_send; delivery is complete when every member channel has received it.
+All benchmark rows are rolled back when the command finishes, so DB calls
+use plain sync_to_async (database_sync_to_async would close the connection
+inside the open transaction).
+"""
+import statistics
+import time
+import uuid
+
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.layers import get_channel_layer
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from accounts.models import CustomUser
+from chat.models import Membership, Message, Room
+
+
+class Command(BaseCommand):
+    help = 'Measure room send and fan-out latency for increasing room sizes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default='10,50,100,250,500',
+            help='Comma-separated room sizes to benchmark.'
+        )
+        parser.add_argument(
+            '--messages', type=int, default=50,
+            help='Messages to send per room size.'
+        )
+
+    def handle(self, *args, **options):
+        sizes = [int(s) for s in options['sizes'].split(',') if s.strip()]
+        count = options['messages']
+
+        self.stdout.write(
+            f'{"members":>8} {"send p50":>10} {"send p95":>10} '
+            f'{"deliver p50":>12} {"deliver p95":>12} {"rows/msg":>9}'
+        )
+
+        with transaction.atomic():
+            for size in sizes:
+                room = self.create_room(size)
+                send, deliver, rows = async_to_sync(self.run_room)(room, size, count)
+                self.stdout.write(
+                    f'{size:>8} {self.ms(send, 50):>10} {self.ms(send, 95):>10} '
+                    f'{self.ms(deliver, 50):>12} {self.ms(deliver, 95):>12} {rows:>9.1f}'
+                )
+            transaction.set_rollback(True)
+
+    def create_room(self, size):
+        """Create a room with `size` throwaway members."""
+        tag = uuid.uuid4().hex[:8]
+        users = CustomUser.objects.bulk_create([
+            CustomUser(
+                username=f'bench-{tag}-{i}',
+                email=f'bench-{tag}-{i}@example.invalid',
+                password='!',
+            )
+            for i in range(size)
+        ])
+        room = Room.objects.create(name=f'bench-{tag}', created_by=users[0])
+        Membership.objects.bulk_create([
+            Membership(room=room, user=user) for user in users
+        ])
+        room.sender = users[0]
+        return room
+
+    async def run_room(self, room, size, count):
+        """Send `count` messages to a room of `size` connected members."""
+        layer = get_channel_layer()
+        channels = [await layer.new_channel() for _ in range(size)]
+        for channel in channels:
+            await layer.group_add(room.group_name, channel)
+
+        send_times = []
+        deliver_times = []
+        rows_before = await self.message_count(room)
+
+        try:
+            for i in range(count):
+                start = time.perf_counter()
+                message_id = await self.save_message(room, f'benchmark message {i}')
+                await layer.group_send(room.group_name, {
+                    'type': 'chat_message',
+                    'message_id': message_id,
+                    'message': f'benchmark message {i}',
+                })
+                send_times.append(time.perf_counter() - start)
+
+                for channel in channels:
+                    await layer.receive(channel)
+                deliver_times.append(time.perf_counter() - start)
+        finally:
+            for channel in channels:
+                await layer.group_discard(room.group_name, channel)
+
+        rows = (await self.message_count(room) - rows_before) / count
+        return send_times, deliver_times, rows
+
+    @sync_to_async
+    def save_message(self, room, content):
+        return Message.objects.create(sender=room.sender, room=room, content=content).id
+
+    @sync_to_async
+    def message_count(self, room):
+        return Message.objects.filter(room=room).count()
+
+    @staticmethod
+    def ms(samples, percentile):
+        """Format a latency percentile in milliseconds."""
+        if len(samples) < 2:
+            value = samples[0] if samples else 0
+        else:
+            value = statistics.quantiles(samples, n=100)[percentile - 1]
+        return f'{value * 1000:.2f}ms'
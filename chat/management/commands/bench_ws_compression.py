@@ -0,0 +1,182 @@
+"""
+Benchmark permessage-deflate settings for chat WebSocket traffic.
+
+Every simulated socket negotiates compression through the same accept
+callback the server uses (chatapp/ws_compression.py), then sends a stream
+of ChatConsumer frames and decompresses a stream of client frames with
+autobahn's deflate implementation. The report shows bandwidth saved next
+to CPU time per frame and the zlib state each socket keeps alive.
+"""
+import gc
+import json
+import random
+import time
+import tracemalloc
+
+from autobahn.websocket.compress import PerMessageDeflate, PerMessageDeflateOffer
+from django.core.management.base import BaseCommand
+
+from chatapp.ws_compression import DEFAULTS, get_config, make_accept
+
+
+PROFILES = [
+    ('off', {'ENABLED': False}),
+    ('settings', None),
+    ('window 15, mem 8', {}),
+    ('window 12, mem 5', {'SERVER_MAX_WINDOW_BITS': 12, 'CLIENT_MAX_WINDOW_BITS': 12, 'MEM_LEVEL': 5}),
+    ('window 10, mem 4', {'SERVER_MAX_WINDOW_BITS': 10, 'CLIENT_MAX_WINDOW_BITS': 10, 'MEM_LEVEL': 4}),
+    ('no context takeover', {'SERVER_NO_CONTEXT_TAKEOVER': True, 'CLIENT_NO_CONTEXT_TAKEOVER': True}),
+]
+
+# What a browser sends: "permessage-deflate; client_max_window_bits"
+BROWSER_OFFER = PerMessageDeflateOffer(accept_no_context_takeover=True, accept_max_window_bits=True)
+
+WORDS = (
+    'hey hi thanks sure ok meeting tomorrow project deadline update review '
+    'the a to and is it for on with can you we lunch call later sounds good '
+    'deploy fixed bug sent file check please today morning afternoon'
+).split()
+
+
+class Command(BaseCommand):
+    help = 'Compare WebSocket bandwidth, CPU and per-socket memory for deflate settings.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=2000, help='Simulated sockets.')
+        parser.add_argument('--frames', type=int, default=50, help='Server frames per socket.')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        outbound = [self.server_frame(rng, i) for i in range(options['frames'])]
+        inbound = [self.client_frame(rng) for _ in range(options['frames'] // 2)]
+        connections = options['connections']
+
+        self.stdout.write(
+            f'{"profile":<22} {"raw":>9} {"wire":>9} {"saved":>6} '
+            f'{"cpu/frame":>10} {"mem/socket":>11} {"mem total":>10}'
+        )
+        for name, overrides in PROFILES:
+            config = get_config() if overrides is None else {**DEFAULTS, **overrides}
+            raw, wire, cpu = self.run_profile(config, outbound, inbound, connections)
+            memory = self.measure_memory(config, outbound, inbound, connections)
+            frames = connections * (len(outbound) + len(inbound))
+            self.stdout.write(
+                f'{name:<22} {raw / 1024:>7.0f}KB {wire / 1024:>7.0f}KB '
+                f'{100 * (1 - wire / raw):>5.1f}% {cpu / frames * 1e6:>8.1f}us '
+                f'{memory / connections / 1024:>9.1f}KB {memory / 1024 / 1024:>8.1f}MB'
+            )
+
+    def run_profile(self, config, outbound, inbound, connections):
+        """Push the frame streams through `connections` sockets; return bytes and CPU seconds."""
+        client_stream = self.client_stream(config, inbound)
+        raw = wire = 0
+        sockets = []
+        start = time.process_time()
+        for _ in range(connections):
+            pmce = self.negotiate(config)
+            for frame in outbound:
+                raw += len(frame)
+                wire += len(self.compress(pmce, frame, config['MIN_SIZE']))
+            for frame, data in client_stream:
+                raw += len(frame)
+                wire += len(data)
+                self.decompress(pmce, data, frame)
+            sockets.append(pmce)
+        return raw, wire, time.process_time() - start
+
+    def measure_memory(self, config, outbound, inbound, connections):
+        """Bytes of compressor state still held once every socket has been used."""
+        client_stream = self.client_stream(config, inbound)
+        gc.collect()
+        tracemalloc.start()
+        sockets = []
+        for _ in range(connections):
+            pmce = self.negotiate(config)
+            for frame in outbound:
+                self.compress(pmce, frame, config['MIN_SIZE'])
+            for frame, data in client_stream:
+                self.decompress(pmce, data, frame)
+            sockets.append(pmce)
+        gc.collect()
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return memory
+
+    @staticmethod
+    def negotiate(config):
+        accept = make_accept(config)
+        offer = accept([BROWSER_OFFER]) if accept else None
+        if offer is None:
+            return None
+        return PerMessageDeflate.create_from_offer_accept(True, offer)
+
+    @staticmethod
+    def compress(pmce, frame, min_size):
+        if pmce is None or len(frame) < min_size:
+            return frame
+        pmce.start_compress_message()
+        return pmce.compress_message_data(frame) + pmce.end_compress_message()
+
+    @staticmethod
+    def decompress(pmce, data, frame):
+        if pmce is None or data is frame:
+            return frame
+        pmce.start_decompress_message()
+        result = pmce.decompress_message_data(data)
+        pmce.end_decompress_message()
+        return result
+
+    def client_stream(self, config, inbound):
+        """Compress client frames once, the way the browser would on one socket."""
+        server = self.negotiate(config)
+        if server is None:
+            return [(frame, frame) for frame in inbound]
+        client = PerMessageDeflate(
+            False,
+            server.server_no_context_takeover,
+            server.client_no_context_takeover,
+            server.server_max_window_bits,
+            server.client_max_window_bits,
+            0,
+        )
+        stream = []
+        for frame in inbound:
+            client.start_compress_message()
+            stream.append((frame, client.compress_message_data(frame) + client.end_compress_message()))
+        return stream
+
+    @staticmethod
+    def sentence(rng):
+        return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 25)))
+
+    def server_frame(self, rng, i):
+        """One outgoing frame, shaped like the ChatConsumer group handlers send."""
+        kind = rng.choices(['chat_message', 'typing', 'user_status', 'messages_read'], [5, 3, 1, 1])[0]
+        user_id, username = rng.choice([(1, 'alice'), (2, 'bob')])
+        if kind == 'chat_message':
+            payload = {
+                'type': 'chat_message',
+                'message_id': 1000 + i,
+                'message': self.sentence(rng),
+                'sender_id': user_id,
+                'sender_username': username,
+                'receiver_id': 3 - user_id,
+                'timestamp': f'2024-05-01T10:{i % 60:02d}:{rng.randint(0, 59):02d}.123456+00:00',
+                'is_read': False,
+                'attachments': [],
+            }
+        elif kind == 'typing':
+            payload = {'type': 'typing', 'user_id': user_id, 'username': username, 'is_typing': rng.random() < 0.5}
+        elif kind == 'user_status':
+            payload = {'type': 'user_status', 'user_id': user_id, 'username': username, 'is_online': True}
+        else:
+            payload = {'type': 'messages_read', 'reader_id': user_id, 'sender_id': 3 - user_id}
+        return json.dumps(payload).encode('utf-8')
+
+    def client_frame(self, rng):
+        if rng.random() < 0.5:
+            payload = {'type': 'chat_message', 'message': self.sentence(rng), 'receiver_id': 2}
+        else:
+            payload = {'type': 'typing', 'is_typing': rng.random() < 0.5}
+        return json.dumps(payload).encode('utf-8')
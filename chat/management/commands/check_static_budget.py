@@ -0,0 +1,56 @@
+"""
+Fail the build when collected static assets outgrow their size budget.
+
+Budgets come from settings.STATIC_SIZE_BUDGETS: a glob over the original
+static names (`*` does not cross directories) mapped to the compressed bytes
+allowed for all matching files together. Each file counts at the size a
+browser downloads: its Brotli copy, else its gzip copy, else the file itself.
+Run after collectstatic.
+"""
+import json
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Check collected static files against STATIC_SIZE_BUDGETS.'
+
+    def handle(self, *args, **options):
+        root = Path(settings.STATIC_ROOT)
+        manifest_path = root / 'staticfiles.json'
+        if not manifest_path.exists():
+            raise CommandError(f'{manifest_path} not found; run collectstatic first.')
+        paths = json.loads(manifest_path.read_text())['paths']
+
+        over = []
+        self.stdout.write(f'{"pattern":<20} {"files":>6} {"raw":>9} {"transfer":>9} {"budget":>9}')
+        for pattern, budget in settings.STATIC_SIZE_BUDGETS.items():
+            regex = self.compile(pattern)
+            names = [hashed for name, hashed in paths.items() if regex.fullmatch(name)]
+            raw = sum((root / name).stat().st_size for name in names)
+            transfer = sum(self.transfer_size(root / name) for name in names)
+            self.stdout.write(
+                f'{pattern:<20} {len(names):>6} {raw:>9,} {transfer:>9,} {budget:>9,}'
+            )
+            if transfer > budget:
+                over.append(f'{pattern} ({transfer:,} > {budget:,} bytes)')
+
+        if over:
+            raise CommandError('Over budget: ' + ', '.join(over))
+        self.stdout.write(self.style.SUCCESS('All static assets are within budget.'))
+
+    @staticmethod
+    def compile(pattern):
+        """Glob to regex where `*` stays within one directory, like the shell."""
+        return re.compile(re.escape(pattern).replace(r'\*', '[^/]*'))
+
+    @staticmethod
+    def transfer_size(path):
+        for suffix in ('.br', '.gz'):
+            compressed = path.with_name(path.name + suffix)
+            if compressed.exists():
+                return compressed.stat().st_size
+        return path.stat().st_size
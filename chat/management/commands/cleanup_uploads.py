@@ -0,0 +1,24 @@
+"""
+Remove abandoned attachment uploads.
+Deletes uploads that never completed or were never sent, with their stored
+and partial files, plus partial files left behind by anything else. Run it
+periodically, e.g. hourly from cron.
+"""
+from django.core.management.base import BaseCommand
+
+from chat.attachments import cleanup_abandoned_uploads, get_config
+
+
+class Command(BaseCommand):
+    help = 'Delete incomplete or unsent uploads older than UPLOAD_EXPIRY and stray partial files.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age', type=int, default=None,
+                            help=f'Seconds before an incomplete or unsent upload is abandoned '
+                                 f'(default {get_config()["UPLOAD_EXPIRY"]}).')
+
+    def handle(self, *args, **options):
+        deleted, removed = cleanup_abandoned_uploads(options['max_age'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {deleted} abandoned uploads and {removed} partial files.'
+        ))
@@ -0,0 +1,133 @@
+"""
+Compress existing large message bodies in batches.
+Walks the table by primary key so each batch is a short transaction, then
+reports bytes saved and the read-time cost of decompression.
+"""
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models.functions import Length
+
+from chat.compression import compress, decompress, get_config, make_preview, should_compress, train_dictionary
+from chat.models import Message
+
+
+class Command(BaseCommand):
+    help = 'Compress (or recompress) large message bodies in batches and report savings.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--recompress', action='store_true',
+                            help='Re-encode already compressed rows with the current settings.')
+        parser.add_argument('--dry-run', action='store_true', help='Report savings without writing.')
+        parser.add_argument('--train-dictionary', metavar='PATH',
+                            help='Train a zstd dictionary from large bodies, write it to PATH and exit.')
+        parser.add_argument('--samples', type=int, default=2000,
+                            help='Bodies used for dictionary training and latency sampling.')
+
+    def handle(self, *args, **options):
+        if options['train_dictionary']:
+            return self.train(options['train_dictionary'], options['samples'])
+
+        if options['recompress']:
+            candidates = Message.objects.filter(content_compressed__isnull=False)
+        else:
+            # A UTF-8 character is at most 4 bytes, so this prefilter can't miss a row
+            candidates = Message.objects.annotate(content_length=Length('content')).filter(
+                content_compressed__isnull=True,
+                content_length__gte=get_config()['THRESHOLD'] // 4,
+            )
+
+        rows = updated = logical = before = after = 0
+        last_id = 0
+        while True:
+            batch = list(candidates.filter(id__gt=last_id).order_by('id')[:options['batch_size']])
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            changed = []
+            for msg in batch:
+                text = msg.body
+                stored = self.stored_size(msg)
+                original = (msg.content, self.blob(msg))
+                if should_compress(text):
+                    msg.content_compressed = compress(text)
+                    msg.content = make_preview(text)
+                else:
+                    msg.content_compressed = None
+                    msg.content = text
+                rows += 1
+                logical += len(text.encode('utf-8'))
+                before += stored
+                after += self.stored_size(msg)
+                # Rows under the threshold, or re-encoded to the same bytes, aren't rewritten
+                if (msg.content, self.blob(msg)) != original:
+                    changed.append(msg)
+                    updated += 1
+
+            if changed and not options['dry_run']:
+                with transaction.atomic():
+                    Message.objects.bulk_update(changed, ['content', 'content_compressed'])
+            self.stdout.write(f'  ... {rows} rows processed (last id {last_id})')
+
+        saved = before - after
+        percent = (saved / before * 100) if before else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'{"Would update" if options["dry_run"] else "Updated"} {updated} of {rows} rows: '
+            f'{logical} bytes of text, stored {before} -> {after} bytes '
+            f'({saved} bytes saved, {percent:.1f}%)'
+        ))
+        self.report_latency(options['samples'])
+
+    @staticmethod
+    def blob(msg):
+        return bytes(msg.content_compressed) if msg.content_compressed is not None else None
+
+    @staticmethod
+    def stored_size(msg):
+        size = len(msg.content.encode('utf-8'))
+        if msg.content_compressed is not None:
+            size += len(msg.content_compressed)
+        return size
+
+    def report_latency(self, samples):
+        """Time decompression of a sample of compressed rows."""
+        blobs = list(
+            Message.objects.filter(content_compressed__isnull=False)
+            .order_by('-id').values_list('content_compressed', flat=True)[:samples]
+        )
+        if not blobs:
+            return
+        timings = []
+        for blob in blobs:
+            start = time.perf_counter()
+            decompress(blob)
+            timings.append((time.perf_counter() - start) * 1e6)
+        p95 = statistics.quantiles(timings, n=20)[-1] if len(timings) > 1 else timings[0]
+        self.stdout.write(
+            f'Read latency impact over {len(timings)} rows: '
+            f'{statistics.mean(timings):.1f}µs mean, {p95:.1f}µs p95 extra per decompressed body'
+        )
+
+    def train(self, path, samples):
+        bodies = []
+        for msg in Message.objects.order_by('-id').iterator(chunk_size=500):
+            if msg.is_compressed or should_compress(msg.content):
+                bodies.append(msg.body)
+                if len(bodies) >= samples:
+                    break
+        if not bodies:
+            raise CommandError('No large message bodies to train on.')
+        try:
+            dictionary = train_dictionary(bodies)
+        except RuntimeError as e:
+            raise CommandError(str(e))
+        with open(path, 'wb') as fh:
+            fh.write(dictionary.as_bytes())
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {len(dictionary.as_bytes())} byte dictionary (id {dictionary.dict_id()}) '
+            f'trained on {len(bodies)} bodies to {path}'
+        ))
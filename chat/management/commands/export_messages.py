@@ -0,0 +1,44 @@
+"""
+Export a user's conversation history as NDJSON or CSV.
+Streams rows from the database, so memory use does not grow with history size.
+"""
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import CustomUser
+from chat.export import CHUNK_SIZE, EXPORT_FORMATS, export_chunks
+
+
+class Command(BaseCommand):
+    help = "Stream a user's messages to a file or stdout as NDJSON or CSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', help='Email address of the user to export.')
+        parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='ndjson')
+        parser.add_argument('--gzip', action='store_true', help='Gzip-compress the output.')
+        parser.add_argument('--output', default='-', help='Output path, or - for stdout.')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                            help='Rows fetched per database round trip.')
+
+    def handle(self, *args, **options):
+        try:
+            user = CustomUser.objects.get(email=options['email'])
+        except CustomUser.DoesNotExist:
+            raise CommandError(f'No user with email {options["email"]}')
+
+        chunks = export_chunks(user, options['format'], options['gzip'], options['chunk_size'])
+
+        if options['output'] == '-':
+            out = sys.stdout.buffer
+            for chunk in chunks:
+                out.write(chunk)
+            out.flush()
+            return
+
+        written = 0
+        with open(options['output'], 'wb') as out:
+            for chunk in chunks:
+                out.write(chunk)
+                written += len(chunk)
+        self.stderr.write(f'Wrote {written} bytes to {options["output"]}')
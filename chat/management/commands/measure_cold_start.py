@@ -0,0 +1,101 @@
+"""
+Measure time-to-first-response of the ASGI app with and without warmup.
+
+Each run starts a fresh Python process, imports chatapp.asgi, optionally
+runs the warmup stage, then sends two requests through the full ASGI stack.
+"""
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+CHILD = r'''
+import asyncio, json, os, sys, time
+
+start = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'chatapp.settings')
+from chatapp.asgi import application
+from chatapp import warmup
+import_ms = (time.perf_counter() - start) * 1000
+
+from asgiref.testing import ApplicationCommunicator
+
+
+async def request(path):
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': 'GET', 'scheme': 'https', 'path': path, 'raw_path': path.encode(),
+        'query_string': b'', 'root_path': '', 'client': ('127.0.0.1', 1),
+        'server': ('localhost', 443), 'headers': [(b'host', b'localhost')],
+    }
+    communicator = ApplicationCommunicator(application, scope)
+    begin = time.perf_counter()
+    await communicator.send_input({'type': 'http.request', 'body': b''})
+    response = await communicator.receive_output(30)
+    while (await communicator.receive_output(30)).get('more_body'):
+        pass
+    return response['status'], (time.perf_counter() - begin) * 1000
+
+
+async def main(path):
+    result = {'import_ms': import_ms, 'warmup_ms': 0.0, 'steps': {}}
+    if os.environ['CHAT_WARMUP'] == 'True':
+        begin = time.perf_counter()
+        await application.start()
+        result['warmup_ms'] = (time.perf_counter() - begin) * 1000
+        result['steps'] = warmup.state['timings']
+    result['status'], result['first_ms'] = await request(path)
+    _, result['second_ms'] = await request(path)
+    print(json.dumps(result))
+
+
+asyncio.run(main(sys.argv[1]))
+'''
+
+
+class Command(BaseCommand):
+    help = 'Compare cold-start time-to-first-response with and without warmup.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/accounts/login/', help='Request path to time.')
+        parser.add_argument('--runs', type=int, default=3, help='Fresh processes per mode.')
+
+    def handle(self, *args, **options):
+        results = {}
+        for label, enabled in (('before (no warmup)', 'False'), ('after (warmup)', 'True')):
+            runs = [self.run_child(options['path'], enabled) for _ in range(options['runs'])]
+            results[label] = runs
+
+        self.stdout.write(
+            f'{"mode":<20} {"import":>9} {"warmup":>9} {"1st req":>9} {"2nd req":>9}'
+        )
+        for label, runs in results.items():
+            avg = {key: sum(run[key] for run in runs) / len(runs)
+                   for key in ('import_ms', 'warmup_ms', 'first_ms', 'second_ms')}
+            self.stdout.write(
+                f'{label:<20} {avg["import_ms"]:>7.1f}ms {avg["warmup_ms"]:>7.1f}ms '
+                f'{avg["first_ms"]:>7.1f}ms {avg["second_ms"]:>7.1f}ms'
+            )
+
+        steps = results['after (warmup)'][-1]['steps']
+        if steps:
+            self.stdout.write('Warmup breakdown (last run): ' + ', '.join(
+                f'{name} {ms:.1f}ms' for name, ms in steps.items()
+            ))
+
+    def run_child(self, path, warmup_enabled):
+        env = dict(os.environ, CHAT_WARMUP=warmup_enabled)
+        proc = subprocess.run(
+            [sys.executable, '-c', CHILD, path],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            raise CommandError(proc.stderr.strip().splitlines()[-1] if proc.stderr else 'child failed')
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        if result['status'] >= 400:
+            raise CommandError(f'{path} returned {result["status"]}')
+        return result
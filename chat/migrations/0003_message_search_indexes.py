@@ -0,0 +1,52 @@
+# Generated by Django 4.2.30 on 2026-10-19 06:25
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class AddIndexConcurrentlyOnPostgres(AddIndexConcurrently):
+    """CREATE INDEX CONCURRENTLY on PostgreSQL; a plain AddIndex on SQLite in development."""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        return migrations.AddIndex.database_forwards(self, app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            return super().database_backwards(app_label, schema_editor, from_state, to_state)
+        return migrations.AddIndex.database_backwards(self, app_label, schema_editor, from_state, to_state)
+
+
+def create_content_search_index(apps, schema_editor):
+    """Full-text GIN index on message content used by the admin search (PostgreSQL only)."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS chat_message_content_fts_idx "
+        "ON chat_message USING gin (to_tsvector('simple', content))"
+    )
+
+
+def drop_content_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX CONCURRENTLY IF EXISTS chat_message_content_fts_idx')
+
+
+class Migration(migrations.Migration):
+
+    # Build indexes without locking out writes to a large chat_message table
+    atomic = False
+
+    dependencies = [
+        ('chat', '0002_rooms'),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyOnPostgres(
+            model_name='message',
+            index=models.Index(fields=['timestamp'], name='chat_message_timestamp_idx'),
+        ),
+        migrations.RunPython(create_content_search_index, drop_content_search_index),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.30 on 2026-10-19 06:27
+
+import chat.models
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('chat', '0003_message_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Attachment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(blank=True, upload_to=chat.models.attachment_upload_to, verbose_name='File')),
+                ('thumbnail', models.FileField(blank=True, upload_to=chat.models.thumbnail_upload_to, verbose_name='Thumbnail')),
+                ('original_name', models.CharField(max_length=255, verbose_name='File Name')),
+                ('content_type', models.CharField(max_length=100, verbose_name='Content Type')),
+                ('size', models.PositiveBigIntegerField(verbose_name='Size (bytes)')),
+                ('width', models.PositiveIntegerField(blank=True, null=True, verbose_name='Width')),
+                ('height', models.PositiveIntegerField(blank=True, null=True, verbose_name='Height')),
+                ('is_complete', models.BooleanField(default=False, verbose_name='Upload Complete')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Created At')),
+                ('message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='attachments', to='chat.message', verbose_name='Message')),
+                ('uploader', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attachments', to=settings.AUTH_USER_MODEL, verbose_name='Uploader')),
+            ],
+            options={
+                'verbose_name': 'Attachment',
+                'verbose_name_plural': 'Attachments',
+                'ordering': ['id'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 06:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0004_attachments'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='content_compressed',
+            field=models.BinaryField(blank=True, null=True, verbose_name='Compressed Content'),
+        ),
+    ]
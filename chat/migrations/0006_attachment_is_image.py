@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 07:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0005_message_content_compressed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attachment',
+            name='is_image',
+            field=models.BooleanField(default=False, verbose_name='Verified Image'),
+        ),
+    ]
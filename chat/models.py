@@ -1,15 +1,87 @@
 """
-Message model for storing chat messages between users.
+Models for storing chat messages and group rooms.
 """
 from django.db import models
 from django.conf import settings
 from django.utils import timezone
 
 
+class Room(models.Model):
+    """
+    Group conversation with many members.
+    Each message is stored once against the room, not once per member.
+    """
+    name = models.CharField(max_length=100, verbose_name='Room Name')
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='created_rooms',
+        verbose_name='Created By'
+    )
+    members = models.ManyToManyField(
+        settings.AUTH_USER_MODEL,
+        through='Membership',
+        related_name='rooms',
+        verbose_name='Members'
+    )
+    created_at = models.DateTimeField(default=timezone.now, verbose_name='Created At')
+
+    class Meta:
+        ordering = ['name']
+        verbose_name = 'Room'
+        verbose_name_plural = 'Rooms'
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def group_name(self):
+        """Channel layer group used to fan out to all connected members."""
+        return self.group_name_for(self.id)
+
+    @staticmethod
+    def group_name_for(room_id):
+        return f'room_{room_id}'
+
+
+class Membership(models.Model):
+    """
+    A user's membership of a room.
+    Read state is a per-member watermark: every message in the room with
+    an id up to `last_read_message_id` counts as read by this member.
+    """
+    room = models.ForeignKey(
+        Room,
+        on_delete=models.CASCADE,
+        related_name='memberships',
+        verbose_name='Room'
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='memberships',
+        verbose_name='User'
+    )
+    last_read_message_id = models.PositiveBigIntegerField(default=0, verbose_name='Last Read Message')
+    joined_at = models.DateTimeField(default=timezone.now, verbose_name='Joined At')
+
+    class Meta:
+        verbose_name = 'Membership'
+        verbose_name_plural = 'Memberships'
+        constraints = [
+            models.UniqueConstraint(fields=['room', 'user'], name='unique_room_membership'),
+        ]
+
+    def __str__(self):
+        return f'{self.user} in {self.room}'
+
+
 class Message(models.Model):
     """
     Chat Message Model.
-    Stores messages between two users with read status tracking.
+    Stores a message either between two users (receiver) or in a group
+    room (room), with read status tracking for one-to-one messages.
     """
     sender = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -20,10 +92,22 @@ class Message(models.Model):
     receiver = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
+        null=True,
+        blank=True,
         related_name='received_messages',
         verbose_name='Receiver'
     )
+    room = models.ForeignKey(
+        Room,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='messages',
+        verbose_name='Room'
+    )
     content = models.TextField(verbose_name='Message Content')
+    content_compressed = models.BinaryField(null=True, blank=True, editable=False,
+                                            verbose_name='Compressed Content')
     timestamp = models.DateTimeField(default=timezone.now, verbose_name='Sent At')
     is_read = models.BooleanField(default=False, verbose_name='Read Status')
 
@@ -31,6 +115,103 @@ class Message(models.Model):
         ordering = ['timestamp']
         verbose_name = 'Message'
         verbose_name_plural = 'Messages'
+        indexes = [
+            models.Index(fields=['room', 'id'], name='chat_message_room_id_idx'),
+            models.Index(fields=['timestamp'], name='chat_message_timestamp_idx'),
+        ]
+
+    def __str__(self):
+        target = self.receiver.username if self.receiver_id else self.room.name
+        return f'{self.sender.username} → {target}: {self.content[:50]}'
+
+    def save(self, *args, **kwargs):
+        """
+        Compress large bodies before writing.
+        `content` keeps only a preview; the full text lives in `content_compressed`,
+        so content search and its full-text index only see the preview of long
+        messages. bulk_create() and update() skip this; run compress_messages
+        after loading rows that way.
+        """
+        from .compression import compress, make_preview, should_compress
+
+        if self.content_compressed is None and should_compress(self.content):
+            self._body = self.content
+            self.content_compressed = compress(self.content)
+            self.content = make_preview(self.content)
+        super().save(*args, **kwargs)
+
+    @property
+    def is_compressed(self):
+        return self.content_compressed is not None
+
+    @property
+    def body(self):
+        """Full message text, decompressed on first access."""
+        if not self.is_compressed:
+            return self.content
+        if not hasattr(self, '_body'):
+            from .compression import decompress
+            self._body = decompress(self.content_compressed)
+        return self._body
+
+    @property
+    def attachment_state(self):
+        """
+        Attachment ids and whether each has a thumbnail yet, e.g. `12t.13`.
+        Part of the bubble's fragment cache key, so a new thumbnail changes it.
+        """
+        return '.'.join(
+            f'{attachment.id}{"t" if attachment.thumbnail else ""}'
+            for attachment in self.attachments.all()
+        )
+
+
+def attachment_upload_to(instance, filename):
+    return f'attachments/{instance.created_at:%Y/%m}/{instance.id}/{filename}'
+
+
+def thumbnail_upload_to(instance, filename):
+    return f'attachments/{instance.created_at:%Y/%m}/{instance.id}/thumb/{filename}'
+
+
+class Attachment(models.Model):
+    """
+    File or image shared in a message.
+    Uploaded in resumable chunks before the message is sent; `message` is
+    set when a chat message references the attachment.
+    """
+    uploader = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='attachments',
+        verbose_name='Uploader'
+    )
+    message = models.ForeignKey(
+        Message,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='attachments',
+        verbose_name='Message'
+    )
+    file = models.FileField(upload_to=attachment_upload_to, blank=True, verbose_name='File')
+    thumbnail = models.FileField(upload_to=thumbnail_upload_to, blank=True, verbose_name='Thumbnail')
+    original_name = models.CharField(max_length=255, verbose_name='File Name')
+    content_type = models.CharField(max_length=100, verbose_name='Content Type')
+    size = models.PositiveBigIntegerField(verbose_name='Size (bytes)')
+    width = models.PositiveIntegerField(null=True, blank=True, verbose_name='Width')
+    height = models.PositiveIntegerField(null=True, blank=True, verbose_name='Height')
+    is_complete = models.BooleanField(default=False, verbose_name='Upload Complete')
+    # Set at finalize when Pillow verified the bytes as PNG/JPEG/GIF/WebP;
+    # only these are served inline, whatever type the client declared
+    is_image = models.BooleanField(default=False, verbose_name='Verified Image')
+    created_at = models.DateTimeField(default=timezone.now, verbose_name='Created At')
+
+    class Meta:
+        ordering = ['id']
+        verbose_name = 'Attachment'
+        verbose_name_plural = 'Attachments'
 
     def __str__(self):
-        return f'{self.sender.username} → {self.receiver.username}: {self.content[:50]}'
+        return self.original_name
+
@@ -0,0 +1,214 @@
+"""
+Bounded outbound queue for WebSocket connections.
+Decouples channel layer delivery from the client socket so one slow
+client cannot back up its channel inbox until messages are dropped.
+
+Sending to the ASGI server never blocks under Daphne (frames go straight
+into the transport's unbounded buffer), so the writer waits on the
+socket's own flow control instead: `chatapp.daphne_server` passes it in
+the scope under FLOW_EXTENSION.
+"""
+import asyncio
+import logging
+import time
+from contextlib import suppress
+from collections import Counter, deque
+
+from django.conf import settings
+
+
+DEFAULTS = {
+    'HIGH_WATERMARK': 256,
+    'LOW_WATERMARK': 64,
+    'OVERLIMIT_GRACE': 10.0,
+}
+
+# Scope extension holding the socket's flow control (an object whose
+# `writable` asyncio.Event is clear while the transport buffer is full)
+FLOW_EXTENSION = 'chat.flow'
+
+# Process-wide counters: enqueued, sent, coalesced, dropped,
+# slow_disconnects, send_errors (reported by /readyz)
+stats = Counter()
+
+logger = logging.getLogger(__name__)
+
+
+def get_config():
+    """Return outbound queue limits merged over the defaults."""
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'CHAT_OUTBOUND_QUEUE', {}))
+    return config
+
+
+class OutboundQueue:
+    """
+    Per-connection frame buffer drained by a single writer task.
+
+    Above the high watermark the queue is "under pressure" until it drains
+    back to the low watermark. While under pressure, droppable frames (typing,
+    status) replace any pending frame with the same key or are dropped.
+    Other frames are always queued; if the queue stays above the high
+    watermark for longer than the grace period, `on_overflow` is awaited so
+    the consumer can disconnect the client with a resume hint. A timer
+    enforces the grace period, so a client that stops reading is
+    disconnected even when nothing more is queued for it.
+
+    With a `flow`, the writer holds frames while the socket is not writable,
+    so they pile up here rather than in the transport. If sending raises,
+    the queue closes and `on_error` is awaited.
+    """
+
+    def __init__(self, send, on_overflow, flow=None, on_error=None):
+        config = get_config()
+        self.high_watermark = config['HIGH_WATERMARK']
+        self.low_watermark = config['LOW_WATERMARK']
+        self.grace = config['OVERLIMIT_GRACE']
+
+        self._send = send
+        self._on_overflow = on_overflow
+        self._on_error = on_error
+        self._flow = flow
+        self._frames = deque()
+        self._pending = {}
+        self._ready = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._over_since = None
+        self._overflow_timer = None
+        self._overflow_task = None
+        self._closed = False
+        self._task = None
+
+        self.under_pressure = False
+        self.stats = Counter()
+
+    def __len__(self):
+        return len(self._frames)
+
+    def start(self):
+        """Start the writer task."""
+        self._task = asyncio.ensure_future(self._writer())
+
+    async def stop(self):
+        """Stop the writer task and discard anything still queued."""
+        self._closed = True
+        self._frames.clear()
+        self._pending.clear()
+        self._clear_overflow_timer()
+        if self._task is not None and self._task is not asyncio.current_task():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    async def put(self, text, key=None):
+        """
+        Queue a text frame.
+        Frames with a `key` are droppable and may be coalesced under pressure.
+        """
+        if self._closed:
+            return
+
+        if key is not None and self.under_pressure:
+            entry = self._pending.get(key)
+            if entry is not None:
+                entry[1] = text
+                self._count('coalesced')
+                return
+            if len(self._frames) >= self.high_watermark:
+                self._count('dropped')
+                return
+
+        entry = [key, text]
+        self._frames.append(entry)
+        if key is not None:
+            self._pending[key] = entry
+        self._count('enqueued')
+        self._idle.clear()
+        self._ready.set()
+
+        if len(self._frames) >= self.high_watermark:
+            self.under_pressure = True
+            if self._over_since is None:
+                self._over_since = time.monotonic()
+                self._overflow_timer = asyncio.get_running_loop().call_later(
+                    max(self.grace, 0), self._overflow_timer_fired,
+                )
+            elif time.monotonic() - self._over_since > self.grace:
+                await self._overflow()
+
+    def _overflow_timer_fired(self):
+        self._overflow_timer = None
+        if self._over_since is not None and not self._closed:
+            self._overflow_task = asyncio.ensure_future(self._overflow())
+
+    def _clear_overflow_timer(self):
+        self._over_since = None
+        if self._overflow_timer is not None:
+            self._overflow_timer.cancel()
+            self._overflow_timer = None
+
+    async def _overflow(self):
+        """Stayed over the limit for the whole grace period: give up on the client."""
+        if self._closed:
+            return
+        self._closed = True
+        self._clear_overflow_timer()
+        self._count('slow_disconnects')
+        await self._on_overflow()
+
+    async def _writer(self):
+        """Drain queued frames to the socket in order."""
+        try:
+            await self._drain()
+        except Exception:
+            logger.exception('Outbound writer failed; closing the connection')
+            self._count('send_errors')
+            self._closed = True
+            self._frames.clear()
+            self._pending.clear()
+            self._idle.set()
+            if self._on_error is not None:
+                with suppress(Exception):
+                    await self._on_error()
+
+    async def _drain(self):
+        while not self._closed:
+            if self._flow is not None and not self._flow.writable.is_set():
+                await self._flow.writable.wait()
+                continue
+
+            if not self._frames:
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+
+            entry = self._frames.popleft()
+            key, text = entry
+            if key is not None and self._pending.get(key) is entry:
+                del self._pending[key]
+
+            if len(self._frames) <= self.low_watermark:
+                self.under_pressure = False
+                self._clear_overflow_timer()
+
+            await self._send(text_data=text)
+            self._count('sent')
+            if not self._frames:
+                self._idle.set()
+
+    async def flush(self, timeout):
+        """Wait up to `timeout` seconds for every queued frame to be sent."""
+        if self._closed or self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def _count(self, name):
+        self.stats[name] += 1
+        stats[name] += 1
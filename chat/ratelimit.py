@@ -0,0 +1,182 @@
+"""
+Per-user token-bucket rate limiting for chat actions.
+
+Each user has a separate bucket per action (messages, typing, read
+receipts, deletes). Buckets live in process memory by default, or in Redis
+for multi-worker deployments, where a Lua script refills and takes tokens
+in one atomic round trip.
+"""
+import logging
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+
+
+DEFAULTS = {
+    'BACKEND': 'memory',  # 'memory' or 'redis'
+    'REDIS_URL': None,
+    'PREFIX': 'ratelimit',
+    # action: (tokens per second, burst size)
+    'BUCKETS': {
+        'message': (2, 10),
+        'typing': (3, 6),
+        'read': (5, 20),
+        'delete': (5, 20),
+    },
+}
+
+Decision = namedtuple('Decision', ['allowed', 'retry_after'])
+
+ALLOW = Decision(True, 0.0)
+
+logger = logging.getLogger(__name__)
+
+
+def get_config():
+    """Return rate limit settings merged over the defaults."""
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'CHAT_RATE_LIMITS', {}))
+    config['BUCKETS'] = {**DEFAULTS['BUCKETS'], **config['BUCKETS']}
+    return config
+
+
+class MemoryStore:
+    """Buckets for a single process, guarded by a lock (views and consumers run on different threads)."""
+
+    prune_every = 10000
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._calls = 0
+
+    def take(self, key, rate, burst, cost=1):
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - last) * rate)
+            if tokens >= cost:
+                self._buckets[key] = (tokens - cost, now)
+                decision = ALLOW
+            else:
+                self._buckets[key] = (tokens, now)
+                decision = Decision(False, (cost - tokens) / rate)
+
+            self._calls += 1
+            if self._calls % self.prune_every == 0:
+                self._prune(now)
+        return decision
+
+    async def atake(self, key, rate, burst, cost=1):
+        return self.take(key, rate, burst, cost)
+
+    def _prune(self, now):
+        """Forget buckets idle for an hour; they have refilled by then."""
+        stale = [
+            key for key, (tokens, last) in self._buckets.items()
+            if now - last > 3600
+        ]
+        for key in stale:
+            del self._buckets[key]
+
+
+class RedisStore:
+    """Buckets shared by all workers, updated atomically by a Lua script."""
+
+    script = """
+        local rate = tonumber(ARGV[1])
+        local burst = tonumber(ARGV[2])
+        local cost = tonumber(ARGV[3])
+        local t = redis.call('TIME')
+        local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+        local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+        local tokens = tonumber(state[1]) or burst
+        local ts = tonumber(state[2]) or now
+        tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+        local retry = 0
+        if tokens >= cost then
+            tokens = tokens - cost
+        else
+            retry = (cost - tokens) / rate
+        end
+        redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+        redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+        return tostring(retry)
+    """
+
+    # Seconds between "failing open" warnings while Redis stays unreachable
+    warn_every = 60
+
+    _last_warning = None
+
+    def __init__(self, url):
+        import redis
+        from redis import asyncio as aioredis
+
+        self._sync = redis.Redis.from_url(url).register_script(self.script)
+        self._async = aioredis.Redis.from_url(url).register_script(self.script)
+
+    def take(self, key, rate, burst, cost=1):
+        try:
+            retry = float(self._sync(keys=[key], args=[rate, burst, cost]))
+        except Exception as e:
+            return self._fail_open(e)  # A Redis outage must not stop chat
+        return Decision(retry == 0, retry)
+
+    async def atake(self, key, rate, burst, cost=1):
+        try:
+            retry = float(await self._async(keys=[key], args=[rate, burst, cost]))
+        except Exception as e:
+            return self._fail_open(e)
+        return Decision(retry == 0, retry)
+
+    def _fail_open(self, error):
+        """Allow the action, warning at most once per `warn_every` seconds."""
+        now = time.monotonic()
+        if self._last_warning is None or now - self._last_warning >= self.warn_every:
+            self._last_warning = now
+            logger.warning('Rate limiting is failing open, Redis is unavailable: %s: %s',
+                           type(error).__name__, error)
+        return ALLOW
+
+
+class RateLimiter:
+    """Checks a user's action against its token bucket."""
+
+    def __init__(self, config=None):
+        config = config or get_config()
+        self.prefix = config['PREFIX']
+        self.buckets = config['BUCKETS']
+        if config['BACKEND'] == 'redis':
+            self.store = RedisStore(config['REDIS_URL'])
+        else:
+            self.store = MemoryStore()
+
+    def _key(self, user_id, action):
+        return f'{self.prefix}:{action}:{user_id}'
+
+    def check(self, user_id, action, cost=1):
+        """Take `cost` tokens; returns a Decision. Unknown actions are not limited."""
+        if action not in self.buckets:
+            return ALLOW
+        rate, burst = self.buckets[action]
+        return self.store.take(self._key(user_id, action), rate, burst, cost)
+
+    async def acheck(self, user_id, action, cost=1):
+        if action not in self.buckets:
+            return ALLOW
+        rate, burst = self.buckets[action]
+        return await self.store.atake(self._key(user_id, action), rate, burst, cost)
+
+
+_limiter = None
+
+
+def get_limiter():
+    """Process-wide limiter built from settings on first use."""
+    global _limiter
+    if _limiter is None:
+        _limiter = RateLimiter()
+    return _limiter
@@ -6,4 +6,5 @@ from . import consumers
 
 websocket_urlpatterns = [
     re_path(r'ws/chat/(?P<room_name>\w+)/$', consumers.ChatConsumer.as_asgi()),
+    re_path(r'ws/rooms/(?P<room_id>\d+)/$', consumers.RoomConsumer.as_asgi()),
 ]
@@ -0,0 +1,197 @@
+import io
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+from unittest import skipUnless
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from accounts.models import CustomUser
+from chat.attachments import (
+    UploadError, append_chunk, cleanup_abandoned_uploads, create_upload, parse_range, partial_path,
+)
+from chat.models import Attachment, Message
+
+
+class ParseRangeTests(SimpleTestCase):
+
+    def test_no_or_unsupported_range(self):
+        self.assertIsNone(parse_range(None, 100))
+        self.assertIsNone(parse_range('', 100))
+        self.assertIsNone(parse_range('bytes=-', 100))
+        self.assertIsNone(parse_range('bytes=0-1,5-6', 100))
+        self.assertIsNone(parse_range('items=0-10', 100))
+
+    def test_bounded_and_open_ranges(self):
+        self.assertEqual(parse_range('bytes=0-9', 100), (0, 9))
+        self.assertEqual(parse_range('bytes=90-', 100), (90, 99))
+        self.assertEqual(parse_range('bytes=50-500', 100), (50, 99))
+
+    def test_suffix_ranges(self):
+        self.assertEqual(parse_range('bytes=-10', 100), (90, 99))
+        self.assertEqual(parse_range('bytes=-500', 100), (0, 99))
+
+    def test_unsatisfiable_ranges(self):
+        for header in ('bytes=100-', 'bytes=10-5', 'bytes=-0'):
+            with self.subTest(header=header), self.assertRaises(ValueError):
+                parse_range(header, 100)
+
+
+class AttachmentTestCase(TestCase):
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = CustomUser.objects.create_user('alice', email='alice@example.com', password='x')
+
+
+class ResumableUploadTests(AttachmentTestCase):
+
+    def test_mismatched_offset_reports_where_to_resume(self):
+        attachment = create_upload(self.user, 'notes.txt', 8, 'text/plain')
+        self.assertEqual(append_chunk(attachment, 0, io.BytesIO(b'abcd'), 4), 4)
+
+        # A retried first chunk is refused with the offset to resume from
+        with self.assertRaises(UploadError) as caught:
+            append_chunk(attachment, 0, io.BytesIO(b'abcd'), 4)
+        self.assertEqual((caught.exception.status, caught.exception.offset), (409, 4))
+
+        self.assertEqual(append_chunk(attachment, 4, io.BytesIO(b'efgh'), 4), 8)
+        attachment.refresh_from_db()
+        self.assertTrue(attachment.is_complete)
+        self.assertFalse(attachment.is_image)
+        with attachment.file.open('rb') as fh:
+            self.assertEqual(fh.read(), b'abcdefgh')
+
+    def test_short_chunk_is_rolled_back(self):
+        attachment = create_upload(self.user, 'notes.txt', 8, 'text/plain')
+        with self.assertRaises(UploadError) as caught:
+            append_chunk(attachment, 0, io.BytesIO(b'ab'), 4)
+        self.assertEqual(caught.exception.offset, 0)
+        self.assertEqual(partial_path(attachment).stat().st_size, 0)
+
+    def test_cleanup_removes_abandoned_uploads(self):
+        attachment = create_upload(self.user, 'notes.txt', 8, 'text/plain')
+        old = time.time() - 7200
+        os.utime(partial_path(attachment), (old, old))
+        Attachment.objects.filter(id=attachment.id).update(created_at=attachment.created_at.replace(year=2000))
+        fresh = create_upload(self.user, 'fresh.txt', 8, 'text/plain')
+
+        self.assertEqual(cleanup_abandoned_uploads(3600), (1, 1))
+        self.assertFalse(partial_path(attachment).exists())
+        self.assertTrue(partial_path(fresh).exists())
+
+    def complete_upload(self, name='notes.txt'):
+        attachment = create_upload(self.user, name, 4, 'text/plain')
+        append_chunk(attachment, 0, io.BytesIO(b'abcd'), 4)
+        attachment.refresh_from_db()
+        return attachment
+
+    def test_cleanup_removes_unsent_uploads_and_their_files(self):
+        unsent = self.complete_upload()
+        Attachment.objects.filter(id=unsent.id).update(created_at=unsent.created_at.replace(year=2000))
+        message = Message.objects.create(sender=self.user, receiver=self.user, content='')
+        sent = self.complete_upload('sent.txt')
+        Attachment.objects.filter(id=sent.id).update(
+            message=message, created_at=sent.created_at.replace(year=2000),
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(cleanup_abandoned_uploads(3600), (1, 0))
+        self.assertFalse(unsent.file.storage.exists(unsent.file.name))
+        self.assertTrue(sent.file.storage.exists(sent.file.name))
+
+    def test_deleting_a_message_removes_stored_files(self):
+        attachment = self.complete_upload()
+        attachment.thumbnail.save('thumb.webp', ContentFile(b'thumb'), save=False)
+        message = Message.objects.create(sender=self.user, receiver=self.user, content='')
+        attachment.message = message
+        attachment.save(update_fields=['message', 'thumbnail'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Message.objects.filter(id=message.id).only('id').delete()
+        self.assertFalse(Attachment.objects.filter(id=attachment.id).exists())
+        self.assertFalse(attachment.file.storage.exists(attachment.file.name))
+        self.assertFalse(attachment.thumbnail.storage.exists(attachment.thumbnail.name))
+
+
+class AttachmentServingTests(AttachmentTestCase):
+
+    def upload(self, name, content_type, body):
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse('chat:attachment_create_api'),
+            json.dumps({'filename': name, 'size': len(body), 'content_type': content_type}),
+            content_type='application/json',
+        )
+        attachment_id = response.json()['id']
+        response = self.client.patch(
+            reverse('chat:attachment_upload_api', args=[attachment_id]),
+            body, content_type='application/octet-stream', HTTP_UPLOAD_OFFSET='0',
+        )
+        self.assertTrue(response.json()['complete'])
+        return self.client.get(reverse('chat:attachment', args=[attachment_id]))
+
+    def test_svg_declared_as_image_downloads(self):
+        svg = b'<svg xmlns="http://www.w3.org/2000/svg"><script>alert(1)</script></svg>'
+        response = self.upload('x.svg', 'image/svg+xml', svg)
+        self.assertEqual(response['Content-Type'], 'application/octet-stream')
+        self.assertTrue(response['Content-Disposition'].startswith('attachment'))
+        self.assertEqual(response['X-Content-Type-Options'], 'nosniff')
+        self.assertEqual(response['Content-Security-Policy'], 'sandbox')
+
+    def test_verified_png_is_served_inline_as_sniffed_type(self):
+        out = io.BytesIO()
+        Image.new('RGB', (4, 4), 'red').save(out, 'PNG')
+        response = self.upload('photo.jpg', 'image/jpeg', out.getvalue())
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertTrue(response['Content-Disposition'].startswith('inline'))
+        self.assertEqual(response['Content-Security-Policy'], 'sandbox')
+
+
+@skipUnless(shutil.which('node'), 'node is not installed')
+class ClientRenderingTests(SimpleTestCase):
+    """Runs static/js/chat/render.js under node; the page inserts its output with insertAdjacentHTML."""
+
+    def render(self, data, is_sent=False):
+        source = Path(settings.BASE_DIR) / 'static' / 'js' / 'chat'
+        build = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, build, ignore_errors=True)
+        for name in ('render.js', 'util.js'):
+            shutil.copy(source / name, build / name)
+        (build / 'package.json').write_text('{"type": "module"}')
+        script = (
+            "import { createMessageElement } from './render.js';"
+            f"process.stdout.write(createMessageElement({json.dumps(data)}, {json.dumps(is_sent)}));"
+        )
+        result = subprocess.run(
+            ['node', '--input-type=module', '-e', script],
+            cwd=build, capture_output=True, text=True, check=True,
+        )
+        return result.stdout
+
+    def test_quotes_in_file_names_stay_inside_attributes(self):
+        name = 'x" onload="alert(1)" y=\'.png'
+        html = self.render({
+            'message_id': 7,
+            'message': '<b>hi</b>',
+            'timestamp': 'Jan 01, 2026 10:00 AM',
+            'attachments': [
+                {'name': name, 'url': '/chat/attachments/1/', 'thumbnail_url': '/chat/attachments/1/thumbnail/'},
+                {'name': name, 'url': '/chat/attachments/2/', 'thumbnail_url': None},
+            ],
+        })
+        self.assertNotIn('onload="', html)
+        self.assertIn('alt="x&quot; onload=&quot;alert(1)&quot; y=&#39;.png"', html)
+        self.assertIn('&lt;b&gt;hi&lt;/b&gt;', html)
@@ -0,0 +1,110 @@
+import io
+import random
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import skipIf
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from accounts.models import CustomUser
+from chat import compression
+from chat.models import Message
+
+
+ZLIB = {'THRESHOLD': 1024, 'PREVIEW_CHARS': 200, 'CODEC': 'zlib', 'LEVEL': 6}
+
+
+def long_body(seed=0, words=400):
+    rng = random.Random(seed)
+    vocabulary = ['deploy', 'staging', 'review', 'merge', 'ticket', 'standup', 'release', 'hotfix',
+                  'rollback', 'sprint', 'backlog', 'meeting', 'tomorrow', 'friday', 'please', 'thanks']
+    return ' '.join(rng.choice(vocabulary) for _ in range(words))
+
+
+@override_settings(CHAT_MESSAGE_COMPRESSION=ZLIB)
+class ThresholdTests(SimpleTestCase):
+
+    def test_should_compress_counts_utf8_bytes(self):
+        self.assertFalse(compression.should_compress('a' * 1023))
+        self.assertTrue(compression.should_compress('a' * 1024))
+        # 342 three-byte characters are 1026 bytes
+        self.assertTrue(compression.should_compress('€' * 342))
+
+    def test_zlib_round_trip(self):
+        text = long_body()
+        blob = compression.compress(text)
+        self.assertEqual(blob[:1], compression.ZLIB)
+        self.assertEqual(compression.decompress(blob), text)
+
+
+@override_settings(CHAT_MESSAGE_COMPRESSION=ZLIB)
+class MessageCompressionTests(TestCase):
+
+    def setUp(self):
+        self.alice = CustomUser.objects.create_user('alice', email='alice@example.com', password='x')
+        self.bob = CustomUser.objects.create_user('bob', email='bob@example.com', password='x')
+
+    def test_save_compresses_and_body_reads_back(self):
+        text = long_body()
+        message = Message.objects.create(sender=self.alice, receiver=self.bob, content=text)
+        stored = Message.objects.get(id=message.id)
+        self.assertTrue(stored.is_compressed)
+        self.assertEqual(stored.content, text[:200])
+        self.assertLess(len(stored.content_compressed), len(text))
+        self.assertEqual(stored.body, text)
+
+    def test_short_message_is_stored_as_is(self):
+        message = Message.objects.create(sender=self.alice, receiver=self.bob, content='hi')
+        stored = Message.objects.get(id=message.id)
+        self.assertFalse(stored.is_compressed)
+        self.assertEqual(stored.body, 'hi')
+
+    def run_command(self, *args):
+        out = io.StringIO()
+        call_command('compress_messages', *args, stdout=out)
+        return out.getvalue()
+
+    def test_second_run_updates_nothing(self):
+        # bulk_create skips Message.save, leaving large bodies uncompressed
+        Message.objects.bulk_create([
+            Message(sender=self.alice, receiver=self.bob, content=long_body(seed)) for seed in range(3)
+        ] + [Message(sender=self.alice, receiver=self.bob, content='x' * 600)])
+
+        self.assertIn('Updated 3 of 4 rows', self.run_command())
+        self.assertIn('Updated 0 of 1 rows', self.run_command())
+        self.assertIn('Updated 0 of 3 rows', self.run_command('--recompress'))
+        for seed, message in enumerate(Message.objects.filter(content_compressed__isnull=False).order_by('id')):
+            self.assertEqual(message.body, long_body(seed))
+
+
+@skipIf(compression.zstandard is None, 'zstandard is not installed')
+class DictionaryRotationTests(TestCase):
+
+    def setUp(self):
+        self.alice = CustomUser.objects.create_user('alice', email='alice@example.com', password='x')
+        self.bob = CustomUser.objects.create_user('bob', email='bob@example.com', password='x')
+        directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.old, self.new = directory / 'old.dict', directory / 'new.dict'
+        for path, offset in ((self.old, 0), (self.new, 1000)):
+            samples = [long_body(offset + seed, words=60) for seed in range(300)]
+            path.write_bytes(compression.train_dictionary(samples, size=4096).as_bytes())
+
+    def settings(self, dictionary, retired=()):
+        return override_settings(CHAT_MESSAGE_COMPRESSION={
+            **ZLIB, 'CODEC': 'zstd', 'DICTIONARY': str(dictionary), 'RETIRED_DICTIONARIES': [str(p) for p in retired],
+        })
+
+    def test_rows_stay_readable_after_rotation(self):
+        text = long_body()
+        with self.settings(self.old):
+            message = Message.objects.create(sender=self.alice, receiver=self.bob, content=text)
+        self.assertEqual(bytes(Message.objects.get(id=message.id).content_compressed)[:1], compression.ZSTD_DICT)
+
+        with self.settings(self.new, retired=[self.old]):
+            self.assertEqual(Message.objects.get(id=message.id).body, text)
+
+        with self.settings(self.new), self.assertRaisesMessage(RuntimeError, 'RETIRED_DICTIONARIES'):
+            Message.objects.get(id=message.id).body
@@ -0,0 +1,119 @@
+import json
+
+from asgiref.sync import sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.test import TransactionTestCase
+
+from accounts.models import CustomUser
+from chat.models import Membership, Message, Room
+from chat.routing import websocket_urlpatterns
+
+
+class ConsumerDeleteScopeTests(TransactionTestCase):
+
+    def setUp(self):
+        self.alice = CustomUser.objects.create_user('alice', email='alice@example.com', password='x')
+        self.bob = CustomUser.objects.create_user('bob', email='bob@example.com', password='x')
+        self.room = Room.objects.create(name='Team', created_by=self.alice)
+        Membership.objects.create(room=self.room, user=self.alice)
+        Membership.objects.create(room=self.room, user=self.bob)
+        self.direct = Message.objects.create(sender=self.alice, receiver=self.bob, content='direct')
+        self.in_room = Message.objects.create(sender=self.alice, room=self.room, content='room')
+
+    async def connect(self, path):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), path)
+        communicator.scope['user'] = self.alice
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        # Own online status
+        await communicator.receive_json_from()
+        return communicator
+
+    async def send_and_settle(self, communicator, frame):
+        await communicator.send_to(text_data=json.dumps(frame))
+        await communicator.receive_nothing(timeout=0.2)
+
+    async def test_room_socket_cannot_delete_direct_message(self):
+        communicator = await self.connect(f'/ws/rooms/{self.room.id}/')
+        await self.send_and_settle(communicator, {'type': 'delete_message', 'message_id': self.direct.id})
+        self.assertTrue(await sync_to_async(Message.objects.filter(id=self.direct.id).exists)())
+
+        await communicator.send_to(text_data=json.dumps({'type': 'delete_message', 'message_id': self.in_room.id}))
+        event = await communicator.receive_json_from()
+        self.assertEqual(event, {'type': 'message_deleted', 'message_id': self.in_room.id, 'deleted_by': self.alice.id})
+        await communicator.disconnect()
+
+    async def test_room_mark_read_broadcasts_the_validated_id(self):
+        communicator = await self.connect(f'/ws/rooms/{self.room.id}/')
+        await communicator.send_to(text_data=json.dumps({'type': 'mark_read', 'message_id': str(self.in_room.id)}))
+        event = await communicator.receive_json_from()
+        self.assertEqual(event, {'type': 'read_watermark', 'reader_id': self.alice.id, 'message_id': self.in_room.id})
+
+        # Not a message of this room: nothing moves, nothing is sent
+        await self.send_and_settle(communicator, {'type': 'mark_read', 'message_id': self.direct.id + 1000})
+        await communicator.disconnect()
+
+    async def test_room_ack_without_message_id_reads_to_the_latest(self):
+        latest = await sync_to_async(Message.objects.create)(sender=self.bob, room=self.room, content='latest')
+        communicator = await self.connect(f'/ws/rooms/{self.room.id}/')
+        await communicator.send_to(text_data=json.dumps({'type': 'ack', 'rooms': [{'room_id': self.room.id}]}))
+        event = await communicator.receive_json_from()
+        self.assertEqual(event['message_id'], latest.id)
+        membership = await sync_to_async(Membership.objects.get)(room=self.room, user=self.alice)
+        self.assertEqual(membership.last_read_message_id, latest.id)
+        await communicator.disconnect()
+
+    async def test_direct_socket_cannot_delete_outside_its_conversation(self):
+        carol = await sync_to_async(CustomUser.objects.create_user)('carol', email='carol@example.com', password='x')
+        other = await sync_to_async(Message.objects.create)(sender=self.alice, receiver=carol, content='other')
+        low, high = sorted([self.alice.id, self.bob.id])
+        communicator = await self.connect(f'/ws/chat/chat_{low}_{high}/')
+
+        await self.send_and_settle(communicator, {'type': 'delete_message', 'message_id': self.in_room.id})
+        await self.send_and_settle(communicator, {
+            'type': 'delete_messages', 'message_ids': [self.in_room.id, other.id],
+        })
+        remaining = await sync_to_async(Message.objects.filter(id__in=[self.in_room.id, other.id]).count)()
+        self.assertEqual(remaining, 2)
+
+        await communicator.send_to(text_data=json.dumps({
+            'type': 'delete_messages', 'message_ids': [self.direct.id, self.in_room.id],
+        }))
+        event = await communicator.receive_json_from()
+        self.assertEqual(event['message_ids'], [self.direct.id])
+        await communicator.disconnect()
+
+    async def test_direct_message_goes_to_the_conversation_partner(self):
+        carol = await sync_to_async(CustomUser.objects.create_user)('carol', email='carol@example.com', password='x')
+        low, high = sorted([self.alice.id, self.bob.id])
+        communicator = await self.connect(f'/ws/chat/chat_{low}_{high}/')
+
+        await communicator.send_to(text_data=json.dumps({
+            'type': 'chat_message', 'message': 'hi', 'receiver_id': carol.id,
+        }))
+        event = await communicator.receive_json_from()
+        self.assertEqual(event['receiver_id'], self.bob.id)
+        message = await sync_to_async(Message.objects.get)(id=event['message_id'])
+        self.assertEqual(message.receiver_id, self.bob.id)
+        await communicator.disconnect()
+
+    async def test_mark_read_broadcasts_only_updated_ids(self):
+        reply = await sync_to_async(Message.objects.create)(sender=self.bob, receiver=self.alice, content='reply')
+        low, high = sorted([self.alice.id, self.bob.id])
+        communicator = await self.connect(f'/ws/chat/chat_{low}_{high}/')
+
+        await self.send_and_settle(communicator, {'type': 'mark_read', 'message_id': self.in_room.id})
+        await communicator.send_to(text_data=json.dumps({'type': 'mark_read', 'message_id': reply.id + 1000}))
+        event = await communicator.receive_json_from()
+        self.assertEqual(event['message_id'], reply.id)
+        self.assertEqual(event['sender_id'], self.bob.id)
+
+        await self.send_and_settle(communicator, {'type': 'mark_read', 'message_id': reply.id})
+        await communicator.disconnect()
+
+    async def test_direct_socket_requires_a_participant(self):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), '/ws/chat/chat_998_999/')
+        communicator.scope['user'] = self.alice
+        connected, _ = await communicator.connect()
+        self.assertFalse(connected)
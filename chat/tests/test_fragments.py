@@ -0,0 +1,61 @@
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from accounts.models import CustomUser
+from chat.fragments import invalidate_messages
+from chat.models import Attachment, Message
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class FragmentCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.alice = CustomUser.objects.create_user('alice', email='alice@example.com', password='x')
+        self.bob = CustomUser.objects.create_user('bob', email='bob@example.com', password='x')
+        self.message = Message.objects.create(sender=self.alice, receiver=self.bob, content='hello')
+        self.client.force_login(self.alice)
+
+    def chat_page(self):
+        return self.client.get(reverse('chat:chat_room', args=[self.bob.id])).content.decode()
+
+    def inbox(self):
+        return self.client.get(reverse('chat:user_list')).content.decode()
+
+    def test_read_receipt_changes_the_keys(self):
+        self.assertIn('title="Sent"', self.chat_page())
+        self.assertNotIn('✓✓', self.inbox())
+
+        Message.objects.filter(id=self.message.id).update(is_read=True)
+
+        self.assertIn('title="Read"', self.chat_page())
+        self.assertIn('✓✓', self.inbox())
+
+    def test_thumbnail_changes_the_bubble_key(self):
+        attachment = Attachment.objects.create(
+            uploader=self.alice, message=self.message, original_name='cat.png',
+            content_type='image/png', size=3, is_complete=True, is_image=True,
+        )
+        self.assertNotIn('attachment-thumb', self.chat_page())
+
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        with override_settings(MEDIA_ROOT=media):
+            attachment.thumbnail.save('thumb.webp', ContentFile(b'abc'))
+
+        self.assertIn('attachment-thumb', self.chat_page())
+
+    def test_edit_invalidates_the_current_keys(self):
+        self.assertIn('hello', self.chat_page())
+
+        Message.objects.filter(id=self.message.id).update(content='edited')
+        self.assertIn('hello', self.chat_page())
+
+        invalidate_messages([self.message.id], self.alice.id, self.bob.id)
+        self.assertIn('edited', self.chat_page())
+        self.assertIn('edited', self.inbox())
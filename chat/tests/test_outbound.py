@@ -0,0 +1,125 @@
+import asyncio
+
+from django.test import SimpleTestCase, override_settings
+
+from chat.outbound import OutboundQueue
+
+
+class Flow:
+    def __init__(self, writable=True):
+        self.writable = asyncio.Event()
+        if writable:
+            self.writable.set()
+
+
+class Recorder:
+    def __init__(self, fail=False):
+        self.sent = []
+        self.fail = fail
+        self.overflows = 0
+        self.errors = 0
+
+    async def send(self, text_data):
+        if self.fail:
+            raise ConnectionError('socket gone')
+        self.sent.append(text_data)
+
+    async def on_overflow(self):
+        self.overflows += 1
+
+    async def on_error(self):
+        self.errors += 1
+
+
+@override_settings(CHAT_OUTBOUND_QUEUE={
+    'HIGH_WATERMARK': 4, 'LOW_WATERMARK': 1, 'OVERLIMIT_GRACE': 60,
+})
+class OutboundQueueTests(SimpleTestCase):
+
+    def make_queue(self, recorder, flow):
+        queue = OutboundQueue(recorder.send, recorder.on_overflow, flow=flow, on_error=recorder.on_error)
+        queue.start()
+        self.addCleanup(lambda: queue._task and queue._task.cancel())
+        return queue
+
+    async def test_paused_socket_keeps_frames_queued(self):
+        recorder, flow = Recorder(), Flow(writable=False)
+        queue = self.make_queue(recorder, flow)
+        for i in range(3):
+            await queue.put(f'm{i}')
+        await asyncio.sleep(0)
+        self.assertEqual(recorder.sent, [])
+        self.assertEqual(len(queue), 3)
+        self.assertFalse(queue.under_pressure)
+
+        await queue.put('m3')
+        self.assertTrue(queue.under_pressure)
+
+    async def test_droppable_frames_coalesce_under_pressure(self):
+        recorder, flow = Recorder(), Flow(writable=False)
+        queue = self.make_queue(recorder, flow)
+        await queue.put('typing-1', key='typing')
+        for i in range(3):
+            await queue.put(f'm{i}')
+        await queue.put('typing-2', key='typing')
+        await queue.put('status', key='status')
+        self.assertEqual(len(queue), 4)
+        self.assertEqual(queue.stats['coalesced'], 1)
+        self.assertEqual(queue.stats['dropped'], 1)
+
+        flow.writable.set()
+        await queue.flush(1)
+        self.assertEqual(recorder.sent, ['typing-2', 'm0', 'm1', 'm2'])
+        self.assertFalse(queue.under_pressure)
+
+    async def test_staying_over_the_limit_disconnects(self):
+        recorder, flow = Recorder(), Flow(writable=False)
+        with self.settings(CHAT_OUTBOUND_QUEUE={
+            'HIGH_WATERMARK': 4, 'LOW_WATERMARK': 1, 'OVERLIMIT_GRACE': -1,
+        }):
+            queue = self.make_queue(recorder, flow)
+        for i in range(5):
+            await queue.put(f'm{i}')
+        self.assertEqual(recorder.overflows, 1)
+        self.assertEqual(queue.stats['slow_disconnects'], 1)
+
+    async def test_send_failure_closes_the_queue(self):
+        recorder = Recorder(fail=True)
+        queue = self.make_queue(recorder, Flow())
+        with self.assertLogs('chat.outbound', 'ERROR'):
+            await queue.put('m0')
+            await queue.flush(1)
+        self.assertEqual(recorder.errors, 1)
+        self.assertEqual(queue.stats['send_errors'], 1)
+
+        await queue.put('m1')
+        self.assertEqual(len(queue), 0)
+
+    async def test_stalled_client_is_disconnected_without_more_traffic(self):
+        recorder, flow = Recorder(), Flow(writable=False)
+        with self.settings(CHAT_OUTBOUND_QUEUE={
+            'HIGH_WATERMARK': 4, 'LOW_WATERMARK': 1, 'OVERLIMIT_GRACE': 0.05,
+        }):
+            queue = self.make_queue(recorder, flow)
+        for i in range(4):
+            await queue.put(f'm{i}')
+        self.assertEqual(recorder.overflows, 0)
+
+        await asyncio.sleep(0.1)
+        self.assertEqual(recorder.overflows, 1)
+        self.assertEqual(queue.stats['slow_disconnects'], 1)
+
+    async def test_draining_below_the_low_watermark_cancels_the_grace_timer(self):
+        recorder, flow = Recorder(), Flow(writable=False)
+        with self.settings(CHAT_OUTBOUND_QUEUE={
+            'HIGH_WATERMARK': 4, 'LOW_WATERMARK': 1, 'OVERLIMIT_GRACE': 0.05,
+        }):
+            queue = self.make_queue(recorder, flow)
+        for i in range(4):
+            await queue.put(f'm{i}')
+        flow.writable.set()
+        await queue.flush(1)
+
+        await asyncio.sleep(0.1)
+        self.assertEqual(recorder.overflows, 0)
+        self.assertEqual(len(recorder.sent), 4)
@@ -0,0 +1,126 @@
+import json
+import time
+from unittest import mock
+
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.urls import reverse
+
+from accounts.models import CustomUser
+from chat import ratelimit
+from chat.ratelimit import MemoryStore, RateLimiter, RedisStore
+from chat.routing import websocket_urlpatterns
+
+
+def limiter(**buckets):
+    return RateLimiter({'BACKEND': 'memory', 'PREFIX': 'test', 'REDIS_URL': None, 'BUCKETS': buckets})
+
+
+class MemoryStoreTests(SimpleTestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch.object(ratelimit, 'time')
+        patcher.start().monotonic.side_effect = lambda: self.now
+        self.addCleanup(patcher.stop)
+        self.store = MemoryStore()
+
+    def take(self, cost=1):
+        return self.store.take('key', rate=2, burst=3, cost=cost)
+
+    def test_burst_then_retry_after(self):
+        for _ in range(3):
+            self.assertEqual(self.take(), ratelimit.ALLOW)
+        decision = self.take()
+        self.assertFalse(decision.allowed)
+        # One token at 2 tokens/second
+        self.assertAlmostEqual(decision.retry_after, 0.5)
+
+    def test_refill_is_proportional_and_capped_at_burst(self):
+        for _ in range(3):
+            self.take()
+        self.now += 0.5
+        self.assertTrue(self.take().allowed)
+        self.assertFalse(self.take().allowed)
+
+        self.now += 60
+        for _ in range(3):
+            self.assertTrue(self.take().allowed)
+        self.assertFalse(self.take().allowed)
+
+    def test_cost_above_remaining_tokens_is_refused_without_spending(self):
+        self.take()
+        decision = self.take(cost=3)
+        self.assertFalse(decision.allowed)
+        self.assertAlmostEqual(decision.retry_after, 0.5)
+        self.assertTrue(self.take(cost=2).allowed)
+
+    def test_unknown_actions_are_not_limited(self):
+        self.assertEqual(limiter(message=(1, 1)).check(1, 'typing'), ratelimit.ALLOW)
+
+
+class CheckCostTests(SimpleTestCase):
+
+    def test_memory_check_takes_well_under_a_millisecond(self):
+        checker = limiter(message=(1000, 1000))
+        checks = 20000
+        start = time.perf_counter()
+        for i in range(checks):
+            checker.check(i % 500, 'message')
+        per_check = (time.perf_counter() - start) / checks
+        self.assertLess(per_check, 0.0001)
+
+
+class FailOpenTests(SimpleTestCase):
+
+    def test_redis_errors_allow_and_warn_once_per_interval(self):
+        store = RedisStore.__new__(RedisStore)
+        store._sync = mock.Mock(side_effect=ConnectionError('refused'))
+        with self.assertLogs('chat.ratelimit', 'WARNING') as logs:
+            self.assertEqual(store.take('key', 1, 1), ratelimit.ALLOW)
+            self.assertEqual(store.take('key', 1, 1), ratelimit.ALLOW)
+        self.assertEqual(len(logs.records), 1)
+
+
+class SendMessageApiTests(TestCase):
+
+    def test_over_limit_is_a_429_with_retry_after(self):
+        alice = CustomUser.objects.create_user('alice', email='alice@example.com', password='x')
+        bob = CustomUser.objects.create_user('bob', email='bob@example.com', password='x')
+        self.client.force_login(alice)
+        body = json.dumps({'receiver_id': bob.id, 'message': 'hi'})
+
+        with mock.patch.object(ratelimit, '_limiter', limiter(message=(0.5, 1))):
+            first = self.client.post(reverse('chat:send_message_api'), body, content_type='application/json')
+            second = self.client.post(reverse('chat:send_message_api'), body, content_type='application/json')
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 429)
+        self.assertEqual(second.json()['status'], 'rate_limited')
+        self.assertAlmostEqual(second.json()['retry_after'], 2, delta=0.1)
+        self.assertEqual(second['Retry-After'], '2')
+
+
+class ConsumerRateLimitTests(TransactionTestCase):
+
+    async def test_over_limit_frame_is_refused_with_rate_limited(self):
+        alice = await CustomUser.objects.acreate(username='alice', email='alice@example.com')
+        bob = await CustomUser.objects.acreate(username='bob', email='bob@example.com')
+        low, high = sorted([alice.id, bob.id])
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'/ws/chat/chat_{low}_{high}/')
+        communicator.scope['user'] = alice
+
+        with mock.patch.object(ratelimit, '_limiter', limiter(typing=(1, 1))):
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            await communicator.receive_json_from()  # own online status
+
+            await communicator.send_to(text_data=json.dumps({'type': 'typing', 'is_typing': True}))
+            await communicator.send_to(text_data=json.dumps({'type': 'typing', 'is_typing': True}))
+            frame = await communicator.receive_json_from()
+
+        self.assertEqual(frame['type'], 'rate_limited')
+        self.assertEqual(frame['action'], 'typing')
+        self.assertGreater(frame['retry_after'], 0)
+        await communicator.disconnect()
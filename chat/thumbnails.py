@@ -0,0 +1,61 @@
+"""
+Image sniffing and thumbnail generation for attachments.
+Runs inside a worker process, so this module must not import Django.
+"""
+import io
+
+# Raster formats safe to serve inline -> the content type they are served as
+INLINE_IMAGE_TYPES = {
+    'PNG': 'image/png',
+    'JPEG': 'image/jpeg',
+    'GIF': 'image/gif',
+    'WEBP': 'image/webp',
+}
+
+
+def sniff_image(path):
+    """
+    Return the content type of the PNG/JPEG/GIF/WebP image at `path`,
+    judged and verified by Pillow from its bytes, or None for anything else.
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+
+    try:
+        with Image.open(path, formats=list(INLINE_IMAGE_TYPES)) as image:
+            image.verify()
+            return INLINE_IMAGE_TYPES[image.format]
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError):
+        return None
+
+
+def make_thumbnail(path, max_size=(320, 320), fmt='WEBP', quality=80):
+    """
+    Read the image at `path` and return its metadata and a thumbnail.
+    Returns None when Pillow is unavailable or the file isn't a readable image.
+    """
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        return None
+
+    try:
+        with Image.open(path) as image:
+            width, height = image.size
+            image.draft('RGB', max_size)  # let JPEG decode at reduced scale
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail(max_size)
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+            out = io.BytesIO()
+            image.save(out, fmt, quality=quality)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+
+    return {
+        'width': width,
+        'height': height,
+        'thumbnail': out.getvalue(),
+    }
@@ -13,4 +13,14 @@ urlpatterns = [
     # API endpoints for fallback chat (AJAX/Polling)
     path('api/send_message/', views.send_message_api, name='send_message_api'),
     path('api/get_messages/<int:other_user_id>/', views.get_new_messages_api, name='get_new_messages_api'),
+
+    # Resumable attachment uploads and ranged downloads
+    path('api/attachments/', views.attachment_create_api, name='attachment_create_api'),
+    path('api/attachments/<int:attachment_id>/upload/', views.attachment_upload_api, name='attachment_upload_api'),
+    path('attachments/<int:attachment_id>/', views.attachment_view, name='attachment'),
+    path('attachments/<int:attachment_id>/thumbnail/', views.attachment_view, {'thumbnail': True},
+         name='attachment_thumbnail'),
+
+    # Streaming history export
+    path('export/', views.export_messages_view, name='export_messages'),
 ]
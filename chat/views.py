@@ -7,11 +7,21 @@ from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.db.models import Q, Max, Count, Subquery, OuterRef
 from accounts.models import CustomUser
-from .models import Message
-from django.http import JsonResponse
-from django.views.decorators.http import require_POST
+from .models import Attachment, Message
+from .export import EXPORT_FORMATS, aiter_chunks, export_chunks
+from .fragments import get_timeout as get_fragment_timeout
+from .ratelimit import get_limiter
+from .attachments import (
+    UploadError, append_chunk, attachment_payload, can_view, create_upload,
+    get_config as get_attachment_config, iter_file_range, link_attachments,
+    parse_range, received_bytes,
+)
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.views.decorators.http import require_POST, require_http_methods
 import json
 from django.utils import timezone
+from django.utils.http import content_disposition_header
 
 
 @login_required
@@ -33,10 +43,11 @@ def user_list_view(request):
         ).count()
 
         # Get last message between current user and this user
+        # (the preview only needs `content`, so compressed bodies are skipped)
         last_message = Message.objects.filter(
             Q(sender=request.user, receiver=user) |
             Q(sender=user, receiver=request.user)
-        ).order_by('-timestamp').first()
+        ).defer('content_compressed').order_by('-timestamp').first()
 
         user_data.append({
             'user': user,
@@ -55,6 +66,7 @@ def user_list_view(request):
 
     context = {
         'user_data': user_data,
+        'fragment_timeout': get_fragment_timeout(),
     }
     return render(request, 'chat/user_list.html', context)
 
@@ -77,7 +89,7 @@ def chat_room_view(request, user_id):
     messages_qs = Message.objects.filter(
         Q(sender=request.user, receiver=other_user) |
         Q(sender=other_user, receiver=request.user)
-    ).order_by('timestamp')
+    ).prefetch_related('attachments').order_by('timestamp')
 
     # Mark unread messages from the other user as read
     Message.objects.filter(
@@ -93,8 +105,13 @@ def chat_room_view(request, user_id):
     context = {
         'other_user': other_user,
         'messages': messages_qs,
-        'room_name': room_name,
-        'current_user_id': request.user.id,
+        'fragment_timeout': get_fragment_timeout(),
+        # Read by static/js/chat/chat.js through json_script
+        'chat_config': {
+            'currentUserId': request.user.id,
+            'otherUserId': other_user.id,
+            'roomName': room_name,
+        },
     }
     return render(request, 'chat/chat.html', context)
 
@@ -103,12 +120,23 @@ def chat_room_view(request, user_id):
 @login_required
 @require_POST
 def send_message_api(request):
+    decision = get_limiter().check(request.user.id, 'message')
+    if not decision.allowed:
+        response = JsonResponse({
+            'status': 'rate_limited',
+            'message': 'Too many messages, slow down.',
+            'retry_after': round(decision.retry_after, 3),
+        }, status=429)
+        response['Retry-After'] = str(max(1, round(decision.retry_after)))
+        return response
+
     try:
         data = json.loads(request.body)
         receiver_id = data.get('receiver_id')
-        content = data.get('message')
+        content = data.get('message') or ''
+        attachment_ids = data.get('attachment_ids') or []
 
-        if not content or not receiver_id:
+        if not (content or attachment_ids) or not receiver_id:
             return JsonResponse({'status': 'error', 'message': 'Missing data'}, status=400)
 
         receiver = get_object_or_404(CustomUser, id=receiver_id)
@@ -118,14 +146,16 @@ def send_message_api(request):
             receiver=receiver,
             content=content
         )
+        attachments = link_attachments(message, request.user, attachment_ids)
 
         return JsonResponse({
             'status': 'success',
             'message': {
                 'id': message.id,
-                'content': message.content,
+                'content': message.body,
                 'timestamp': message.timestamp.strftime('%b %d, %Y %I:%M %p'),
-                'sender_id': message.sender.id
+                'sender_id': message.sender.id,
+                'attachments': attachments,
             }
         })
     except Exception as e:
@@ -140,19 +170,169 @@ def get_new_messages_api(request, other_user_id):
         sender=other_user,
         receiver=request.user,
         is_read=False
-    ).order_by('timestamp')
+    ).prefetch_related('attachments').order_by('timestamp')
     
     messages_data = []
     for msg in new_messages:
         messages_data.append({
             'type': 'chat_message',
             'message_id': msg.id,
-            'message': msg.content,
+            'message': msg.body,
             'sender_id': msg.sender.id,
             'timestamp': msg.timestamp.strftime('%b %d, %Y %I:%M %p'),
+            'attachments': [attachment_payload(a) for a in msg.attachments.all()],
         })
         # Mark as read immediately for this simple implementation
         msg.is_read = True
         msg.save()
-        
+
     return JsonResponse({'messages': messages_data})
+
+
+# --- ATTACHMENTS ---
+
+@login_required
+@require_POST
+def attachment_create_api(request):
+    """
+    Start a resumable upload.
+    Body: {"filename", "size", "content_type"}; returns the attachment id.
+    """
+    try:
+        data = json.loads(request.body)
+        size = int(data.get('size'))
+        attachment = create_upload(request.user, data.get('filename', ''), size, data.get('content_type'))
+    except (ValueError, TypeError):
+        return JsonResponse({'status': 'error', 'message': 'Missing data'}, status=400)
+    except UploadError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=e.status)
+
+    return JsonResponse({
+        'status': 'success',
+        'id': attachment.id,
+        'offset': 0,
+        'chunk_size': get_attachment_config()['CHUNK_SIZE'],
+    }, status=201)
+
+
+@login_required
+@require_http_methods(['GET', 'HEAD', 'PATCH'])
+def attachment_upload_api(request, attachment_id):
+    """
+    GET/HEAD report the current offset so an interrupted upload can resume.
+    PATCH appends the raw request body at the `Upload-Offset` header.
+    """
+    attachment = get_object_or_404(Attachment, id=attachment_id, uploader=request.user)
+
+    if request.method == 'PATCH':
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+            offset = append_chunk(attachment, offset, request, length)
+        except ValueError:
+            return JsonResponse({'status': 'error', 'message': 'Missing Upload-Offset'}, status=400)
+        except UploadError as e:
+            response = JsonResponse({'status': 'error', 'message': str(e), 'offset': e.offset}, status=e.status)
+            response['Upload-Offset'] = str(e.offset)
+            return response
+    else:
+        offset = received_bytes(attachment)
+
+    response = JsonResponse({
+        'status': 'success',
+        'id': attachment.id,
+        'offset': offset,
+        'complete': attachment.is_complete,
+    })
+    response['Upload-Offset'] = str(offset)
+    return response
+
+
+@login_required
+@require_http_methods(['GET', 'HEAD'])
+def attachment_view(request, attachment_id, thumbnail=False):
+    """
+    Serve an attachment (or its thumbnail) with Range support.
+    Attachment files never change, so they are cached as immutable.
+    """
+    attachment = get_object_or_404(
+        Attachment.objects.select_related('message'), id=attachment_id, is_complete=True
+    )
+    if not can_view(request.user, attachment):
+        raise Http404
+
+    field = attachment.thumbnail if thumbnail else attachment.file
+    if not field:
+        raise Http404
+    size = field.size if thumbnail else attachment.size
+    etag = f'"{attachment.id}-{"thumb" if thumbnail else "file"}-{size}"'
+
+    cache_control = f'private, max-age={get_attachment_config()["CACHE_MAX_AGE"]}, immutable'
+    if request.headers.get('If-None-Match') == etag:
+        response = HttpResponse(status=304)
+        response['ETag'] = etag
+        response['Cache-Control'] = cache_control
+        return response
+
+    try:
+        byte_range = parse_range(request.headers.get('Range'), size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    start, end = byte_range or (0, size - 1)
+    length = end - start + 1
+
+    chunks = iter_file_range(field, start, length) if request.method == 'GET' else iter(())
+    if isinstance(request, ASGIRequest):
+        chunks = aiter_chunks(chunks)
+
+    if thumbnail:
+        content_type = 'image/webp'
+    elif attachment.is_image:
+        content_type = attachment.content_type
+    else:
+        content_type = 'application/octet-stream'
+    response = StreamingHttpResponse(chunks, status=206 if byte_range else 200, content_type=content_type)
+    response['Content-Length'] = str(length)
+    response['Accept-Ranges'] = 'bytes'
+    if byte_range:
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+    # Only Pillow-verified raster images render inline; anything else, such
+    # as an SVG or HTML file declared as an image, downloads and can't script
+    as_attachment = not (thumbnail or attachment.is_image)
+    response['Content-Disposition'] = content_disposition_header(as_attachment, attachment.original_name)
+    response['X-Content-Type-Options'] = 'nosniff'
+    response['Content-Security-Policy'] = 'sandbox'
+    return response
+
+
+# --- EXPORT ---
+
+@login_required
+def export_messages_view(request):
+    """
+    Stream the current user's conversation history as NDJSON or CSV.
+    Query params: format=ndjson|csv, gzip=1 to compress on the fly.
+    """
+    fmt = request.GET.get('format', 'ndjson')
+    if fmt not in EXPORT_FORMATS:
+        return JsonResponse({'status': 'error', 'message': 'Unsupported format'}, status=400)
+    compress = request.GET.get('gzip') == '1'
+
+    chunks = export_chunks(request.user, fmt, compress)
+    if isinstance(request, ASGIRequest):
+        chunks = aiter_chunks(chunks)
+
+    filename = f'messages-{request.user.username}.{EXPORT_FORMATS[fmt]["extension"]}'
+    if compress:
+        filename += '.gz'
+        content_type = 'application/gzip'
+    else:
+        content_type = EXPORT_FORMATS[fmt]['content_type']
+
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
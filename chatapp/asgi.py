@@ -1,6 +1,7 @@
 """
 ASGI config for chatapp project.
-Configures Django Channels with WebSocket routing.
+Configures Django Channels with WebSocket routing, wrapped in the
+cold-start warmup and /healthz, /readyz endpoints.
 """
 
 import os
@@ -14,8 +15,9 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'chatapp.settings')
 django_asgi_app = get_asgi_application()
 
 from chat.routing import websocket_urlpatterns
+from chatapp.warmup import WarmupMiddleware
 
-application = ProtocolTypeRouter({
+application = WarmupMiddleware(ProtocolTypeRouter({
     "http": django_asgi_app,
     "websocket": AllowedHostsOriginValidator(
         AuthMiddlewareStack(
@@ -24,4 +26,4 @@ application = ProtocolTypeRouter({
             )
         )
     ),
-})
+}))
@@ -0,0 +1,123 @@
+"""
+Daphne entrypoint with permessage-deflate configured for chat sockets,
+and write-side flow control exposed to the chat consumers.
+
+Usage is the same as the `daphne` command:
+
+    python -m chatapp.daphne_server -b 0.0.0.0 -p 8000 chatapp.asgi:application
+"""
+import daphne.server  # isort:skip  (installs the asyncio Twisted reactor first)
+
+import asyncio
+
+from daphne.cli import CommandLineInterface
+from daphne.ws_protocol import WebSocketProtocol
+from twisted.internet.interfaces import IPushProducer
+from zope.interface import implementer
+
+from chat.outbound import FLOW_EXTENSION
+from chatapp.ws_compression import get_config, is_compressible_path, make_accept
+
+
+def _decline(offers):
+    return None
+
+
+@implementer(IPushProducer)
+class SocketFlow:
+    """
+    Push producer registered on a WebSocket's transport.
+
+    Twisted pauses it once the transport's send buffer passes `bufferSize`
+    and resumes it when the buffer has drained; `writable` mirrors that for
+    the application's OutboundQueue. It replaces the producer left behind
+    by the HTTP channel the socket was upgraded from.
+    """
+
+    def __init__(self):
+        self.writable = asyncio.Event()
+        self.writable.set()
+
+    @classmethod
+    def attach(cls, transport):
+        """Register a new flow on `transport`, or return None if it can't take one."""
+        flow = cls()
+        try:
+            if getattr(transport, 'producer', None) is not None:
+                transport.unregisterProducer()
+            transport.registerProducer(flow, True)
+        except (AttributeError, RuntimeError):
+            return None
+        return flow
+
+    def pauseProducing(self):
+        self.writable.clear()
+
+    def resumeProducing(self):
+        self.writable.set()
+
+    def stopProducing(self):
+        # Connection lost: let the writer run into the closed socket and exit
+        self.writable.set()
+
+
+class CompressingWebSocketProtocol(WebSocketProtocol):
+    """
+    Daphne's WebSocket protocol with per-path deflate negotiation, a size
+    floor, and a SocketFlow for the application.
+    """
+
+    _accept = None
+    min_compress_size = 0
+    flow = None
+
+    def onConnect(self, request):
+        self.flow = SocketFlow.attach(self.transport)
+
+        cls = type(self)
+        if cls._accept is None:
+            config = get_config()
+            cls._accept = make_accept(config) or _decline
+            cls.min_compress_size = config['MIN_SIZE']
+
+        # Negotiation happens after onConnect, once the application accepts
+        if is_compressible_path(request.path):
+            self.perMessageCompressionAccept = cls._accept
+        else:
+            self.perMessageCompressionAccept = _decline
+        return super().onConnect(request)
+
+    def sendMessage(self, payload, isBinary=False, fragmentSize=None, sync=False, doNotCompress=False):
+        if len(payload) < self.min_compress_size:
+            doNotCompress = True
+        super().sendMessage(payload, isBinary, fragmentSize, sync, doNotCompress)
+
+
+class Server(daphne.server.Server):
+    """
+    Swaps in CompressingWebSocketProtocol when Daphne builds its WebSocket
+    factory, and hands each socket's SocketFlow to the application.
+    """
+
+    def create_application(self, protocol, scope):
+        flow = getattr(protocol, 'flow', None)
+        if flow is not None:
+            scope['extensions'] = {**scope.get('extensions', {}), FLOW_EXTENSION: flow}
+        return super().create_application(protocol, scope)
+
+    @property
+    def ws_factory(self):
+        return self._ws_factory
+
+    @ws_factory.setter
+    def ws_factory(self, factory):
+        factory.protocol = CompressingWebSocketProtocol
+        self._ws_factory = factory
+
+
+class CompressingCommandLineInterface(CommandLineInterface):
+    server_class = Server
+
+
+if __name__ == '__main__':
+    CompressingCommandLineInterface.entrypoint()
@@ -0,0 +1,48 @@
+"""
+Paginators shared by the project's admin classes.
+"""
+import json
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models.query import QuerySet
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that avoids an exact COUNT(*) on very large PostgreSQL tables.
+
+    Unfiltered querysets use the table's planner statistics (pg_class.reltuples);
+    filtered ones use the row estimate from EXPLAIN. Estimates below
+    `exact_threshold` fall back to an exact count, so small result sets and
+    other database backends paginate exactly as before.
+    """
+    exact_threshold = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if isinstance(queryset, QuerySet) and connections[queryset.db].vendor == 'postgresql':
+            estimate = self._estimate(queryset)
+            if estimate is not None and estimate > self.exact_threshold:
+                return estimate
+        return super().count
+
+    def _estimate(self, queryset):
+        connection = connections[queryset.db]
+        with connection.cursor() as cursor:
+            if not queryset.query.where:
+                cursor.execute(
+                    'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                    [queryset.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+                return int(row[0]) if row and row[0] >= 0 else None
+
+            sql, params = queryset.query.get_compiler(queryset.db).as_sql()
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return int(plan[0]['Plan']['Plan Rows'])
@@ -68,17 +68,30 @@ TEMPLATES = [
 WSGI_APPLICATION = 'chatapp.wsgi.application'
 ASGI_APPLICATION = 'chatapp.asgi.application'
 
+# Pre-import, compile templates and open connections when a worker starts (chatapp/warmup.py)
+CHAT_WARMUP = os.environ.get('CHAT_WARMUP', 'True') == 'True'
+
 # ---------------------------------------------------------------------------
 # CHANNEL LAYERS — Redis in production, in-memory for local dev
 # ---------------------------------------------------------------------------
 REDIS_URL = os.environ.get('REDIS_URL', None)
 
-if REDIS_URL:
+# Comma-separated Redis URLs to shard groups/channels across (see chatapp/channel_layers.py)
+REDIS_URLS = [u.strip() for u in os.environ.get('REDIS_URLS', REDIS_URL or '').split(',') if u.strip()]
+
+# 'queue' (sorted-set inboxes, buffered) or 'pubsub' (lower fan-out latency, unbuffered)
+CHANNEL_LAYER_DELIVERY = os.environ.get('CHANNEL_LAYER_DELIVERY', 'queue')
+
+if REDIS_URLS:
     CHANNEL_LAYERS = {
         'default': {
-            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'BACKEND': (
+                'chatapp.channel_layers.ShardedRedisPubSubChannelLayer'
+                if CHANNEL_LAYER_DELIVERY == 'pubsub'
+                else 'chatapp.channel_layers.ShardedRedisChannelLayer'
+            ),
             'CONFIG': {
-                'hosts': [REDIS_URL],
+                'hosts': REDIS_URLS,
             },
         },
     }
@@ -89,6 +102,65 @@ else:
         },
     }
 
+# Per-connection outbound buffer limits (see chat/outbound.py)
+CHAT_OUTBOUND_QUEUE = {
+    'HIGH_WATERMARK': int(os.environ.get('CHAT_OUTBOUND_HIGH_WATERMARK', 256)),
+    'LOW_WATERMARK': int(os.environ.get('CHAT_OUTBOUND_LOW_WATERMARK', 64)),
+    'OVERLIMIT_GRACE': float(os.environ.get('CHAT_OUTBOUND_OVERLIMIT_GRACE', 10)),
+}
+
+# Connection draining on SIGTERM (see chat/drain.py)
+CHAT_DRAIN = {
+    'BATCH_SIZE': int(os.environ.get('CHAT_DRAIN_BATCH_SIZE', 50)),
+    'BATCH_INTERVAL': float(os.environ.get('CHAT_DRAIN_BATCH_INTERVAL', 0.5)),
+    'RECONNECT_SPREAD': float(os.environ.get('CHAT_DRAIN_RECONNECT_SPREAD', 10)),
+    'FLUSH_TIMEOUT': 2.0,
+    'TIMEOUT': float(os.environ.get('CHAT_DRAIN_TIMEOUT', 25)),
+}
+
+# permessage-deflate for chat sockets (see chatapp/ws_compression.py).
+# Window 12 / memLevel 5 keeps ~50KB of zlib state per socket instead of ~300KB
+# for nearly the same savings; measure with `manage.py bench_ws_compression`.
+CHAT_WS_COMPRESSION = {
+    'ENABLED': os.environ.get('CHAT_WS_COMPRESSION', 'True') == 'True',
+    'SERVER_MAX_WINDOW_BITS': int(os.environ.get('CHAT_WS_COMPRESSION_WINDOW_BITS', 12)),
+    'CLIENT_MAX_WINDOW_BITS': int(os.environ.get('CHAT_WS_COMPRESSION_WINDOW_BITS', 12)),
+    'SERVER_NO_CONTEXT_TAKEOVER': os.environ.get('CHAT_WS_COMPRESSION_NO_CONTEXT_TAKEOVER', 'False') == 'True',
+    'CLIENT_NO_CONTEXT_TAKEOVER': os.environ.get('CHAT_WS_COMPRESSION_NO_CONTEXT_TAKEOVER', 'False') == 'True',
+    'MEM_LEVEL': int(os.environ.get('CHAT_WS_COMPRESSION_MEM_LEVEL', 5)),
+    'MIN_SIZE': int(os.environ.get('CHAT_WS_COMPRESSION_MIN_SIZE', 0)),
+}
+
+# Per-user token buckets: action -> (tokens per second, burst). Redis-backed when available.
+CHAT_RATE_LIMITS = {
+    'BACKEND': 'redis' if REDIS_URLS else 'memory',
+    'REDIS_URL': REDIS_URLS[0] if REDIS_URLS else None,
+    'BUCKETS': {
+        'message': (2, 10),
+        'typing': (3, 6),
+        'read': (5, 20),
+        'delete': (5, 20),
+    },
+}
+
+# Rendered message bubbles and inbox previews (see chat/fragments.py). Shared through
+# Redis so every worker shares one copy, and an admin edit invalidates it everywhere.
+if REDIS_URLS:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URLS[0],
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+    }
+
+CHAT_FRAGMENT_CACHE_TIMEOUT = int(os.environ.get('CHAT_FRAGMENT_CACHE_TIMEOUT', 24 * 60 * 60))
+
 # ---------------------------------------------------------------------------
 # DATABASE — PostgreSQL in production, SQLite locally
 # ---------------------------------------------------------------------------
@@ -135,8 +207,46 @@ STATIC_URL = '/static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
-# WhiteNoise: compressed + cached static files
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedStaticFilesStorage'
+# WhiteNoise: hashed names, Brotli/gzip copies, immutable caching (see chatapp/storage.py)
+STATICFILES_STORAGE = 'chatapp.storage.ChatStaticFilesStorage'
+
+# Compressed bytes allowed per group of collected files; checked by
+# `manage.py check_static_budget` after collectstatic.
+STATIC_SIZE_BUDGETS = {
+    'js/*.js': 1 * 1024,
+    'js/chat/*.js': 8 * 1024,
+    'css/*.css': 6 * 1024,
+}
+
+# ---------------------------------------------------------------------------
+# MEDIA / ATTACHMENTS — served through chat views, never directly
+# ---------------------------------------------------------------------------
+MEDIA_URL = '/media/'
+MEDIA_ROOT = Path(os.environ.get('MEDIA_ROOT', BASE_DIR / 'media'))
+
+# Chunked upload limits and thumbnail worker pool (see chat/attachments.py)
+CHAT_ATTACHMENTS = {
+    'MAX_SIZE': int(os.environ.get('CHAT_ATTACHMENT_MAX_SIZE', 25 * 1024 * 1024)),
+    'CHUNK_SIZE': 1024 * 1024,
+    'THUMBNAIL_SIZE': (320, 320),
+    'WORKERS': int(os.environ.get('CHAT_THUMBNAIL_WORKERS', 2)),
+    # Incomplete or unsent uploads older than this are removed by `manage.py cleanup_uploads`
+    'UPLOAD_EXPIRY': int(os.environ.get('CHAT_UPLOAD_EXPIRY', 24 * 60 * 60)),
+}
+
+# ---------------------------------------------------------------------------
+# MESSAGE COMPRESSION — large bodies are compressed at rest (chat/compression.py)
+# ---------------------------------------------------------------------------
+CHAT_MESSAGE_COMPRESSION = {
+    'THRESHOLD': int(os.environ.get('CHAT_COMPRESS_THRESHOLD', 1024)),
+    'CODEC': os.environ.get('CHAT_COMPRESS_CODEC', 'zlib'),  # 'zstd' needs the zstandard package
+    'LEVEL': int(os.environ.get('CHAT_COMPRESS_LEVEL', 6)),
+    'DICTIONARY': os.environ.get('CHAT_COMPRESS_DICTIONARY') or None,
+    # Comma-separated paths of earlier dictionaries still needed to read old rows
+    'RETIRED_DICTIONARIES': [
+        path for path in os.environ.get('CHAT_COMPRESS_RETIRED_DICTIONARIES', '').split(',') if path
+    ],
+}
 
 # ---------------------------------------------------------------------------
 # DEFAULT PRIMARY KEY FIELD TYPE
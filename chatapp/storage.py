@@ -0,0 +1,14 @@
+"""
+Static files storage.
+
+WhiteNoise's CompressedManifestStaticFilesStorage gives every file a content
+hash in its name and writes Brotli/gzip copies next to it; WhiteNoise then
+serves hashed names with `Cache-Control: immutable`. ES module imports
+between the chat scripts are rewritten to hashed names as well, so a changed
+module never hides behind a cached importer.
+"""
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+
+class ChatStaticFilesStorage(CompressedManifestStaticFilesStorage):
+    support_js_module_import_aggregation = True
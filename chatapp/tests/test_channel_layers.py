@@ -0,0 +1,29 @@
+from collections import Counter
+
+from django.test import SimpleTestCase
+
+from chatapp.channel_layers import HashRing
+
+
+class HashRingTests(SimpleTestCase):
+    hosts = ['redis-a:6379/0', 'redis-b:6379/0', 'redis-c:6379/0']
+    groups = [f'chat_chat_{i}_{i + 7}' for i in range(10000)]
+
+    def test_groups_are_balanced_across_hosts(self):
+        ring = HashRing(self.hosts)
+        counts = Counter(ring.get_index(name) for name in self.groups)
+        share = len(self.groups) / len(self.hosts)
+        for index in range(len(self.hosts)):
+            self.assertLess(abs(counts[index] - share), share * 0.1)
+
+    def test_adding_a_host_moves_about_one_nth(self):
+        before = HashRing(self.hosts)
+        after = HashRing(self.hosts + ['redis-d:6379/0'])
+        moved = [name for name in self.groups if before.get_index(name) != after.get_index(name)]
+        self.assertAlmostEqual(len(moved) / len(self.groups), 1 / 4, delta=0.05)
+        # Everything that moved went to the new host
+        self.assertEqual({after.get_index(name) for name in moved}, {3})
+
+    def test_bytes_and_str_agree(self):
+        ring = HashRing(self.hosts)
+        self.assertEqual(ring.get_index('chat_room'), ring.get_index(b'chat_room'))
@@ -0,0 +1,193 @@
+"""
+Cold-start warmup and health endpoints for the ASGI application.
+
+After a sleep/wake cycle the first requests pay for module imports,
+template compilation and DB/Redis connection setup. `WarmupMiddleware`
+does that work up front: at lifespan startup on servers that support it,
+and otherwise as soon as the first connection (usually the platform's
+health check) reaches a Daphne worker.
+
+`/healthz` (liveness) and `/readyz` (readiness, with the measured
+per-step timings and the outbound queue counters) are answered here,
+before Django's middleware, so probes stay cheap and are never
+redirected to HTTPS.
+"""
+import asyncio
+import importlib
+import json
+import logging
+import time
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from chat.outbound import stats as outbound_stats
+
+
+WARM_MODULES = [
+    'chat.consumers',
+    'chat.views',
+    'chat.admin',
+    'chat.export',
+    'chat.attachments',
+    'accounts.views',
+    'accounts.forms',
+    'accounts.admin',
+]
+
+TEMPLATE_DIRS = ['chat', 'accounts']
+
+state = {
+    'ready': False,
+    'error': False,  # details are logged, never returned by /readyz
+    'timings': {},  # step -> milliseconds
+}
+
+logger = logging.getLogger(__name__)
+
+
+def _timed(name, func):
+    start = time.perf_counter()
+    result = func()
+    state['timings'][name] = round((time.perf_counter() - start) * 1000, 2)
+    return result
+
+
+def warm_imports():
+    for module in WARM_MODULES:
+        importlib.import_module(module)
+
+
+def warm_urls():
+    from django.urls import get_resolver, reverse
+    get_resolver().url_patterns
+    reverse('chat:user_list')
+    reverse('accounts:login')
+
+
+def warm_templates():
+    """Compile chat/* and accounts/* templates into the cached loader."""
+    from django.template.loader import get_template
+    root = Path(settings.TEMPLATES[0]['DIRS'][0])
+    names = ['base.html']
+    for directory in TEMPLATE_DIRS:
+        names += [f'{directory}/{path.name}' for path in sorted((root / directory).glob('*.html'))]
+    for name in names:
+        get_template(name)
+
+
+def warm_auth():
+    """Load the session engine, auth backends and password hashers used on every login."""
+    from django.contrib.auth import get_backends, get_user_model
+    from django.contrib.auth.hashers import get_hashers
+    importlib.import_module(settings.SESSION_ENGINE)
+    get_backends()
+    get_hashers()
+    get_user_model()
+
+
+def warm_database():
+    from django.db import connection
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+
+
+async def warm_channel_layer():
+    """One send/receive round trip opens the layer's connection pool on this loop."""
+    from channels.layers import get_channel_layer
+    layer = get_channel_layer()
+    if layer is None:
+        return
+    channel = await layer.new_channel()
+    await layer.send(channel, {'type': 'warmup'})
+    await asyncio.wait_for(layer.receive(channel), timeout=5)
+
+
+def _sync_steps():
+    _timed('imports', warm_imports)
+    _timed('urls', warm_urls)
+    _timed('templates', warm_templates)
+    _timed('auth', warm_auth)
+    _timed('database', warm_database)
+
+
+async def warm_up():
+    """
+    Run every warmup step and mark the app ready.
+    Sync steps run in the thread-sensitive executor. Channels consumers'
+    database_sync_to_async calls share that thread, so they reuse the
+    database connection opened here. Django's ASGI handler gives each HTTP
+    request its own thread context, so views open their own connections.
+    """
+    start = time.perf_counter()
+    try:
+        await sync_to_async(_sync_steps, thread_sensitive=True)()
+        step = time.perf_counter()
+        await warm_channel_layer()
+        state['timings']['channel_layer'] = round((time.perf_counter() - step) * 1000, 2)
+    except Exception:
+        # Serve anyway; a failed warmup only means the first requests are slower
+        logger.exception('Warmup failed')
+        state['error'] = True
+    state['timings']['total'] = round((time.perf_counter() - start) * 1000, 2)
+    state['ready'] = True
+
+
+class WarmupMiddleware:
+    """ASGI wrapper that runs warmup and answers /healthz and /readyz."""
+
+    def __init__(self, app):
+        self.app = app
+        self._task = None
+        if not getattr(settings, 'CHAT_WARMUP', True):
+            state['ready'] = True
+
+    def start(self):
+        if self._task is None and not state['ready']:
+            self._task = asyncio.ensure_future(warm_up())
+        return self._task
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+
+        self.start()
+
+        if scope['type'] == 'http' and scope['path'] == '/healthz':
+            return await self.respond(send, 200, {'status': 'ok'})
+        if scope['type'] == 'http' and scope['path'] == '/readyz':
+            status = 200 if state['ready'] else 503
+            return await self.respond(send, status, {
+                'status': 'ready' if state['ready'] else 'warming',
+                **state,
+                'outbound': dict(outbound_stats),
+            })
+
+        return await self.app(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                task = self.start()
+                if task is not None:
+                    await task
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    @staticmethod
+    async def respond(send, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [
+                (b'content-type', b'application/json'),
+                (b'content-length', str(len(body)).encode()),
+                (b'cache-control', b'no-store'),
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': body})
@@ -0,0 +1,80 @@
+"""
+permessage-deflate (RFC 7692) negotiation for the chat WebSocket endpoints.
+
+Chat frames are small, repetitive JSON, so deflate with context takeover
+shrinks them a lot, but each compressed socket keeps a zlib compressor and
+decompressor alive for its whole lifetime. Window bits and memory level
+bound that cost; frames under `MIN_SIZE` bytes are sent uncompressed.
+
+Only paths routed by `chat.routing` negotiate compression. Daphne doesn't
+expose these options itself; see chatapp/daphne_server.py.
+"""
+from autobahn.websocket.compress import (
+    PerMessageDeflateOffer,
+    PerMessageDeflateOfferAccept,
+)
+from django.conf import settings
+
+
+DEFAULTS = {
+    'ENABLED': True,
+    'SERVER_MAX_WINDOW_BITS': 15,  # 9..15; server -> client LZ77 window
+    'CLIENT_MAX_WINDOW_BITS': 15,  # requested from clients that support it
+    'SERVER_NO_CONTEXT_TAKEOVER': False,
+    'CLIENT_NO_CONTEXT_TAKEOVER': False,
+    'MEM_LEVEL': 8,  # 1..9; zlib compressor state size
+    'MIN_SIZE': 0,  # frames shorter than this are sent uncompressed
+}
+
+
+def get_config():
+    """Return WebSocket compression settings merged over the defaults."""
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'CHAT_WS_COMPRESSION', {}))
+    return config
+
+
+def make_accept(config=None):
+    """
+    Build the `perMessageCompressionAccept` callback for autobahn.
+    Returns None when compression is disabled.
+    """
+    config = config or get_config()
+    if not config['ENABLED']:
+        return None
+
+    def accept(offers):
+        for offer in offers:
+            if not isinstance(offer, PerMessageDeflateOffer):
+                continue
+            # The server may always use a smaller window or drop its context
+            # without telling the client; the client-side limits are requested
+            # only if the offer says the client supports them.
+            client_bits = config['CLIENT_MAX_WINDOW_BITS']
+            return PerMessageDeflateOfferAccept(
+                offer,
+                request_no_context_takeover=(
+                    config['CLIENT_NO_CONTEXT_TAKEOVER'] and offer.accept_no_context_takeover
+                ),
+                request_max_window_bits=(
+                    client_bits if client_bits < 15 and offer.accept_max_window_bits else 0
+                ),
+                no_context_takeover=(
+                    config['SERVER_NO_CONTEXT_TAKEOVER'] or offer.request_no_context_takeover
+                ),
+                window_bits=min(
+                    config['SERVER_MAX_WINDOW_BITS'], offer.request_max_window_bits or 15
+                ),
+                mem_level=config['MEM_LEVEL'],
+            )
+        return None
+
+    return accept
+
+
+def is_compressible_path(path):
+    """True if `path` is served by one of the consumers in chat.routing."""
+    from chat.routing import websocket_urlpatterns
+
+    path = path.lstrip('/')
+    return any(pattern.pattern.match(path) for pattern in websocket_urlpatterns)
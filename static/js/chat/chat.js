@@ -0,0 +1,332 @@
+// ============================
+// Chat page entry point
+// ============================
+import { ChatConnection } from './connection.js';
+import { createMessageElement } from './render.js';
+import { uploadFile } from './upload.js';
+import { postJSON } from './util.js';
+
+// ============================
+// Configuration & State
+// ============================
+const config = JSON.parse(document.getElementById('chat-config').textContent);
+const currentUserId = config.currentUserId;
+const otherUserId = config.otherUserId;
+
+let typingTimeout = null;
+let isTyping = false;
+
+// ============================
+// DOM References
+// ============================
+const chatMessages = document.getElementById('chat-messages');
+const messageInput = document.getElementById('message-input');
+const sendBtn = document.getElementById('send-btn');
+const chatForm = document.getElementById('chat-form');
+const typingIndicator = document.getElementById('typing-indicator');
+const typingText = document.getElementById('typing-text');
+const chatStatus = document.getElementById('chat-status');
+const statusDot = document.getElementById('user-status-dot');
+const attachBtn = document.getElementById('attach-btn');
+const fileInput = document.getElementById('file-input');
+
+const connection = new ChatConnection({
+    roomName: config.roomName,
+    otherUserId,
+    onFrame: handleWebSocketMessage,
+});
+
+function scrollToBottom() {
+    requestAnimationFrame(() => {
+        chatMessages.scrollTop = chatMessages.scrollHeight;
+    });
+}
+
+// ============================
+// Message Handlers
+// ============================
+function handleWebSocketMessage(data) {
+    switch (data.type) {
+        case 'chat_message':
+            handleChatMessage(data);
+            break;
+        case 'typing':
+            handleTypingIndicator(data);
+            break;
+        case 'messages_read':
+            handleMessagesRead(data);
+            break;
+        case 'user_status':
+            handleUserStatus(data);
+            break;
+        case 'message_deleted':
+            handleMessageDeleted(data);
+            break;
+        case 'messages_deleted':
+            data.message_ids.forEach(id => handleMessageDeleted({ message_id: id }));
+            break;
+        case 'rate_limited':
+            console.warn(`Rate limited (${data.action}); retry in ${data.retry_after}s`);
+            break;
+    }
+}
+
+function handleChatMessage(data) {
+    // Remove empty chat placeholder
+    const emptyChat = document.getElementById('empty-chat');
+    if (emptyChat) emptyChat.remove();
+
+    const isSent = data.sender_id === currentUserId;
+
+    // Check if message already exists (to prevent duplicates from polling + sending)
+    if (document.getElementById(`msg-${data.message_id}`)) {
+        return;
+    }
+
+    chatMessages.insertAdjacentHTML('beforeend', createMessageElement(data, isSent));
+    scrollToBottom();
+
+    // If received a message and NOT using polling, mark it as read via socket
+    // (If using polling, the API read endpoint usually marks it read automatically)
+    if (!isSent) {
+        connection.send({
+            'type': 'mark_read',
+            'sender_id': otherUserId,
+        });
+        typingIndicator.style.display = 'none';
+    }
+}
+
+function handleTypingIndicator(data) {
+    if (data.user_id === otherUserId) {
+        if (data.is_typing) {
+            typingIndicator.style.display = 'flex';
+            typingText.textContent = `${data.username} is typing...`;
+            scrollToBottom();
+        } else {
+            typingIndicator.style.display = 'none';
+        }
+    }
+}
+
+function handleMessagesRead(data) {
+    if (data.sender_id === currentUserId) {
+        // My messages have been read by the other person, up to
+        // `message_id` when the reader acknowledged only part of them
+        document.querySelectorAll('.read-receipt').forEach(el => {
+            if (data.message_id && Number(el.dataset.msgId) > data.message_id) return;
+            el.innerHTML = '<span class="read" title="Read">✓✓</span>';
+        });
+    }
+}
+
+function handleUserStatus(data) {
+    if (data.user_id === otherUserId) {
+        if (data.is_online) {
+            statusDot.classList.remove('offline');
+            statusDot.classList.add('online');
+            chatStatus.textContent = 'Online';
+            chatStatus.classList.add('status-online');
+        } else {
+            statusDot.classList.remove('online');
+            statusDot.classList.add('offline');
+            chatStatus.textContent = 'Offline';
+            chatStatus.classList.remove('status-online');
+        }
+    }
+}
+
+function handleMessageDeleted(data) {
+    const msgEl = document.getElementById(`msg-${data.message_id}`);
+    if (msgEl) {
+        msgEl.classList.add('message-fade-out');
+        setTimeout(() => msgEl.remove(), 300);
+    }
+}
+
+// Add a message sent over HTTP, since no socket frame will echo it back
+function showSentMessage(data) {
+    handleChatMessage({
+        sender_id: currentUserId,
+        message_id: data.message.id,
+        message: data.message.content,
+        timestamp: data.message.timestamp,
+        attachments: data.message.attachments,
+        type: 'chat_message'
+    });
+}
+
+// ============================
+// Send Message
+// ============================
+function sendMessage() {
+    const message = messageInput.value.trim();
+
+    // Prevent empty messages
+    if (!message) return;
+
+    if (connection.usePolling) {
+        // HTTP POST Sending
+        postJSON('/chat/api/send_message/', {
+            'receiver_id': otherUserId,
+            'message': message
+        })
+        .then(data => {
+            if (data.status === 'success') {
+                showSentMessage(data);
+                messageInput.value = '';
+                messageInput.focus();
+            } else {
+                console.error('Send failed:', data.message);
+            }
+        })
+        .catch(err => console.error('Send API error:', err));
+        return;
+    }
+
+    // WebSocket Sending
+    if (!connection.isOpen) {
+        console.warn('Socket not open. Switching to polling.');
+        connection.enablePolling();
+        sendMessage(); // Retry with polling
+        return;
+    }
+
+    connection.send({
+        'type': 'chat_message',
+        'message': message,
+        'receiver_id': otherUserId,
+    });
+
+    messageInput.value = '';
+    messageInput.focus();
+
+    // Stop typing indicator
+    if (isTyping) {
+        connection.send({
+            'type': 'typing',
+            'is_typing': false,
+        });
+        isTyping = false;
+    }
+}
+
+async function sendAttachment(file) {
+    attachBtn.disabled = true;
+    try {
+        const attachmentId = await uploadFile(file);
+        const caption = messageInput.value.trim();
+        if (!connection.isOpen) {
+            connection.enablePolling();
+            const data = await postJSON('/chat/api/send_message/', {
+                receiver_id: otherUserId, message: caption, attachment_ids: [attachmentId],
+            });
+            if (data.status === 'success') {
+                showSentMessage(data);
+            }
+        } else {
+            connection.send({
+                'type': 'chat_message',
+                'message': caption,
+                'receiver_id': otherUserId,
+                'attachment_ids': [attachmentId],
+            });
+        }
+        messageInput.value = '';
+    } catch (err) {
+        console.error('Attachment upload failed:', err);
+        alert('Could not upload the file.');
+    } finally {
+        attachBtn.disabled = false;
+        fileInput.value = '';
+    }
+}
+
+// ============================
+// Delete Message
+// ============================
+function deleteMessage(messageId) {
+    if (connection.usePolling) {
+        // We haven't implemented DELETE API for polling yet.
+        alert('Delete not supported in this mode yet.');
+        return;
+    }
+
+    if (!connection.isOpen) return;
+
+    if (confirm('Delete this message?')) {
+        connection.send({
+            'type': 'delete_message',
+            'message_id': messageId,
+        });
+    }
+}
+
+// ============================
+// Typing Indicator
+// ============================
+function handleTyping() {
+    // Typing indicators don't work well with polling
+    if (!connection.isOpen) return;
+
+    if (!isTyping) {
+        isTyping = true;
+        connection.send({
+            'type': 'typing',
+            'is_typing': true,
+        });
+    }
+
+    clearTimeout(typingTimeout);
+    typingTimeout = setTimeout(() => {
+        isTyping = false;
+        connection.send({
+            'type': 'typing',
+            'is_typing': false,
+        });
+    }, 2000);
+}
+
+// ============================
+// Event Listeners
+// ============================
+chatForm.addEventListener('submit', function (e) {
+    e.preventDefault();
+    sendMessage();
+});
+
+sendBtn.addEventListener('click', sendMessage);
+
+messageInput.addEventListener('keydown', function (e) {
+    if (e.key === 'Enter' && !e.shiftKey) {
+        e.preventDefault();
+        sendMessage();
+    }
+});
+
+messageInput.addEventListener('input', handleTyping);
+
+attachBtn.addEventListener('click', () => fileInput.click());
+fileInput.addEventListener('change', () => {
+    if (fileInput.files.length) sendAttachment(fileInput.files[0]);
+});
+
+// Delete buttons on server-rendered and live messages alike
+chatMessages.addEventListener('click', function (e) {
+    const button = e.target.closest('.btn-delete-msg');
+    if (button) {
+        deleteMessage(Number(button.closest('.message').dataset.messageId));
+    }
+});
+
+// Focus on input when page loads
+messageInput.focus();
+
+// Auto-scroll on page load
+scrollToBottom();
+
+// Connect WebSocket
+connection.connect();
+
+// Handle page unload
+window.addEventListener('beforeunload', () => connection.close());
@@ -0,0 +1,132 @@
+// ============================
+// WebSocket connection with reconnects and an HTTP polling fallback
+// ============================
+
+const MAX_RECONNECT_ATTEMPTS = 3;
+const POLL_INTERVAL = 3000;
+
+export class ChatConnection {
+    constructor({ roomName, otherUserId, onFrame }) {
+        this.roomName = roomName;
+        this.otherUserId = otherUserId;
+        this.onFrame = onFrame;
+
+        this.socket = null;
+        this.reconnectAttempts = 0;
+        this.resumePending = false;
+        this.serverReconnectDelay = null;
+
+        // State for Fallback Mode (Polling)
+        this.usePolling = false;
+        this.pollingInterval = null;
+    }
+
+    get isOpen() {
+        return !this.usePolling && this.socket !== null && this.socket.readyState === WebSocket.OPEN;
+    }
+
+    send(frame) {
+        if (!this.isOpen) return false;
+        this.socket.send(JSON.stringify(frame));
+        return true;
+    }
+
+    connect() {
+        // If we've already failed too many times, forcing polling don't retry socket
+        if (this.usePolling) return;
+
+        const wsScheme = window.location.protocol === 'https:' ? 'wss' : 'ws';
+        const wsUrl = `${wsScheme}://${window.location.host}/ws/chat/${this.roomName}/`;
+
+        this.socket = new WebSocket(wsUrl);
+
+        this.socket.onopen = () => {
+            console.log('WebSocket connected');
+            this.reconnectAttempts = 0;
+
+            // Catch up on anything missed after a slow-consumer disconnect
+            if (this.resumePending) {
+                this.resumePending = false;
+                this.poll();
+            }
+
+            // Mark messages as read when chat is opened
+            this.send({
+                'type': 'mark_read',
+                'sender_id': this.otherUserId,
+            });
+        };
+
+        this.socket.onmessage = (e) => {
+            const data = JSON.parse(e.data);
+            if (data.type === 'reconnect') {
+                // Server dropped us for falling behind, or is restarting and
+                // suggests a randomized delay; refetch missed messages either way
+                this.resumePending = true;
+                if (data.delay_ms !== undefined) this.serverReconnectDelay = data.delay_ms;
+                return;
+            }
+            this.onFrame(data);
+        };
+
+        this.socket.onclose = (e) => {
+            console.log('WebSocket disconnected', e.code);
+            if (this.usePolling) return;
+            if (this.serverReconnectDelay !== null) {
+                // Planned restart: doesn't count towards falling back to polling
+                const delay = this.serverReconnectDelay;
+                this.serverReconnectDelay = null;
+                console.log(`Server restarting, reconnecting in ${delay}ms`);
+                setTimeout(() => this.connect(), delay);
+            } else if (this.reconnectAttempts < MAX_RECONNECT_ATTEMPTS) {
+                this.reconnectAttempts++;
+                const delay = Math.min(1000 * Math.pow(2, this.reconnectAttempts), 5000);
+                console.log(`Reconnecting in ${delay}ms... (attempt ${this.reconnectAttempts})`);
+                setTimeout(() => this.connect(), delay);
+            } else {
+                console.warn('Max reconnect attempts reached. Switching to HTTP Polling.');
+                this.enablePolling();
+            }
+        };
+
+        this.socket.onerror = (error) => {
+            console.error('WebSocket error:', error);
+            // On error, we rely on onclose to trigger reconnection logic
+        };
+    }
+
+    enablePolling() {
+        if (this.usePolling) return;
+        this.usePolling = true;
+        console.log('Polling mode enabled.');
+
+        if (this.socket) {
+            this.socket.close(); // Ensure socket is closed
+            this.socket = null;
+        }
+
+        // Start polling immediately and then interval
+        this.poll();
+        this.pollingInterval = setInterval(() => this.poll(), POLL_INTERVAL);
+    }
+
+    poll() {
+        fetch(`/chat/api/get_messages/${this.otherUserId}/`)
+            .then(response => response.json())
+            .then(data => {
+                if (data.messages) {
+                    data.messages.forEach(msg => this.onFrame(msg));
+                }
+            })
+            .catch(err => console.error('Polling error:', err));
+    }
+
+    close() {
+        if (this.socket) {
+            this.socket.close();
+        }
+        if (this.pollingInterval) {
+            clearInterval(this.pollingInterval);
+        }
+    }
+}
@@ -0,0 +1,43 @@
+// ============================
+// Message bubble markup (mirrors the server-rendered bubble in chat.html)
+// ============================
+import { escapeHtml } from './util.js';
+
+export function createMessageElement(data, isSent) {
+    const deleteBtn = isSent ?
+        `<button class="btn-delete-msg" title="Delete message">
+            <i class="bi bi-trash3"></i>
+        </button>` : '';
+
+    const readReceipt = isSent ?
+        `<span class="read-receipt" data-msg-id="${data.message_id}">
+            <span class="sent" title="Sent">✓</span>
+        </span>` : '';
+
+    // File names are chosen by the uploader; every interpolated value is escaped
+    const attachments = (data.attachments || []).map(att => `
+        <div class="message-attachment">
+            ${att.thumbnail_url
+                ? `<a href="${escapeHtml(att.url)}" target="_blank" rel="noopener">
+                       <img src="${escapeHtml(att.thumbnail_url)}" alt="${escapeHtml(att.name)}" class="attachment-thumb" loading="lazy">
+                   </a>`
+                : `<a href="${escapeHtml(att.url)}" class="attachment-file"><i class="bi bi-paperclip"></i> ${escapeHtml(att.name)}</a>`}
+        </div>`).join('');
+
+    const text = data.message ? `<p class="message-text">${escapeHtml(data.message)}</p>` : '';
+
+    return `
+        <div class="message ${isSent ? 'sent' : 'received'} message-animate"
+             id="msg-${data.message_id}" data-message-id="${data.message_id}">
+            <div class="message-bubble">
+                ${attachments}
+                ${text}
+                <div class="message-meta">
+                    <span class="message-time">${data.timestamp}</span>
+                    ${readReceipt}
+                </div>
+            </div>
+            ${deleteBtn}
+        </div>
+    `;
+}
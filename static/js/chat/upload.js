@@ -0,0 +1,41 @@
+// ============================
+// Attachments (chunked, resumable upload)
+// ============================
+import { getCookie } from './util.js';
+
+export async function uploadFile(file) {
+    const headers = { 'X-CSRFToken': getCookie('csrftoken') };
+    const start = await fetch('/chat/api/attachments/', {
+        method: 'POST',
+        headers: { ...headers, 'Content-Type': 'application/json' },
+        body: JSON.stringify({ filename: file.name, size: file.size, content_type: file.type }),
+    }).then(r => r.json());
+    if (start.status !== 'success') throw new Error(start.message);
+
+    const uploadUrl = `/chat/api/attachments/${start.id}/upload/`;
+    let offset = 0;
+    let failures = 0;
+    while (offset < file.size) {
+        try {
+            const response = await fetch(uploadUrl, {
+                method: 'PATCH',
+                headers: { ...headers, 'Upload-Offset': String(offset) },
+                body: file.slice(offset, offset + start.chunk_size),
+            });
+            const result = await response.json();
+            if (response.ok || response.status === 409) {
+                // 409 means the server has a different offset; resume from there
+                offset = result.offset;
+                failures = 0;
+                continue;
+            }
+            throw new Error(result.message);
+        } catch (err) {
+            if (++failures > 3) throw err;
+            await new Promise(resolve => setTimeout(resolve, 1000 * failures));
+            const status = await fetch(uploadUrl).then(r => r.json());
+            offset = status.offset;
+        }
+    }
+    return start.id;
+}
@@ -0,0 +1,8 @@
+// Client-side user search filter
+document.getElementById('user-search').addEventListener('input', function () {
+    const query = this.value.toLowerCase();
+    document.querySelectorAll('.user-item').forEach(item => {
+        const name = item.querySelector('.user-display-name').textContent.toLowerCase();
+        item.style.display = name.includes(query) ? '' : 'none';
+    });
+});